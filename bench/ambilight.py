@@ -0,0 +1,65 @@
+"""Measure building and encoding of ambilight frames.
+
+A frame with a different color in every zone is built and encoded to the ``ambilight/cached`` payload,
+with :class:`AmbilightFrame` and with nested dictionaries as done for :meth:`PhilipsAPI.set_ambilight_expert`.
+
+Run with ``python -m bench.ambilight`` from the repository root.
+"""
+import json
+import argparse
+import timeit
+
+import numpy as np
+
+from philipstv.api.ambilight import AmbilightFrame, SIDES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--layers', default='1', help="ambilight layers")
+    parser.add_argument('--zones', type=int, nargs=4, default=[4, 9, 4, 0], metavar=('LEFT', 'TOP', 'RIGHT', 'BOTTOM'),
+                        help="number of zones at every side")
+    parser.add_argument('-n', '--number', type=int, default=10000, help="number of repetitions")
+    args = parser.parse_args()
+    topology = dict(zip(SIDES, args.zones), layers=args.layers)
+
+    frame = AmbilightFrame(topology)
+    colors = np.random.default_rng(0).integers(0, 256, frame.shape, np.uint8)
+    colors[1:] = colors[0]  # set_ambilight_expert sets the same colors in all layers
+    step = np.zeros(frame.shape, np.uint8)
+
+    def vectorized():
+        np.add(colors, step, out=colors)
+        frame.data[...] = colors
+        return frame.payload()
+
+    def nested():
+        np.add(colors, step, out=colors)
+        values = {
+            side: {str(n): dict(zip('rgb', colors[0, s, n].tolist())) for n in range(topology[side])}
+            for s, side in enumerate(SIDES)
+        }
+        data = {}
+        for l in str(topology['layers']):
+            data[f"layer{l}"] = layer = {}
+            for side, vals in values.items():
+                if vals: layer[side] = vals
+        return json.dumps(data).encode('utf-8')
+
+    mask = np.zeros(frame.shape[:3], bool)
+    mask[0, 1, :3] = True
+
+    def delta():
+        return frame.payload(mask)
+
+    assert json.loads(vectorized()) == json.loads(nested())
+    step[...] = 1
+    zones = sum(args.zones) * len(args.layers)
+    print(f"{zones} zones, {len(frame.payload())} bytes payload")
+    for name, func in ('AmbilightFrame', vectorized), ('nested dicts', nested), ('3-zone delta', delta):
+        best = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number
+        print(f"{name:<16} {1e6 * best:8.1f} us/frame")
+
+
+if __name__ == '__main__':
+    main()
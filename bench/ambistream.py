@@ -0,0 +1,59 @@
+"""Measure throughput of ambilight streaming.
+
+Frames with a moving highlight are pushed at the given rate to a fake TV, which can add artificial
+latency to every request. Sent and dropped frames, payload sizes and the measured latency are reported.
+
+Run with ``python -m bench.ambistream`` from the repository root.
+"""
+import argparse
+
+from time import monotonic, sleep
+
+from philipstv.api import PhilipsAPI
+from philipstv.api.ambilight import AmbilightStream
+
+from .faketv import FakeTV
+
+
+def _run(tv, args, delta):
+    api = PhilipsAPI(tv.host, 'user', 'secret')
+    stream = AmbilightStream(api, rate=args.rate, delta=delta)
+    stream.start()
+    frame = stream.frame
+    zones = frame.mask.sum()
+    start = monotonic()
+    pushed = 0
+    while monotonic() - start < args.time:
+        frame.fill(0, 0, 64)
+        index = pushed % zones
+        layers, sides, positions = frame.mask.nonzero()
+        frame.data[layers[index], sides[index], positions[index]] = 255, 255, 255
+        stream.push()
+        pushed += 1
+        sleep(max(start + pushed / args.push_rate - monotonic(), 0))
+    elapsed = monotonic() - start
+    stream.stop()
+    return pushed, stream, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-t', '--time', type=float, default=3.0, help="measurement time in seconds")
+    parser.add_argument('--rate', type=float, default=50.0, help="maximum stream frame rate")
+    parser.add_argument('--push-rate', type=float, default=100.0, help="rate of pushing new frames")
+    parser.add_argument('--latency', type=float, nargs='+', default=[0., 0.01, 0.05], help="fake TV latencies")
+    args = parser.parse_args()
+
+    print(f"pushing {args.push_rate:g} frames/s for {args.time:g}s, stream rate limit {args.rate:g}/s")
+    print(f"{'latency':>8} {'mode':<6} {'sent/s':>7} {'dropped':>8} {'bytes/frame':>12} {'ack [ms]':>9}")
+    for latency in args.latency:
+        with FakeTV('127.0.0.6', 'user', 'secret', delay=latency) as tv:
+            for delta in False, True:
+                pushed, stream, elapsed = _run(tv, args, delta)
+                print(f"{1000 * latency:>6.0f}ms {'delta' if delta else 'full':<6} {stream.sent / elapsed:>7.1f} "
+                      f"{stream.dropped:>8} {stream.bytes / max(stream.sent, 1):>12.0f} "
+                      f"{1000 * stream.latency[0]:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Measure rendering speed and playback timing of ambilight effects.
+
+Effects are rendered into frame buffers and the rendering speed is reported in frames per second. Then
+a buffer is played to a stream that only counts frames, while another thread produces garbage, and frame
+lateness is compared with a naive loop sleeping between frames.
+
+Run with ``python -m bench.effects`` from the repository root.
+"""
+import argparse
+import threading
+
+from time import perf_counter, monotonic, sleep
+
+import numpy as np
+
+from philipstv.api.ambilight import SIDES
+from philipstv.api.effects import fade, breathing, gradient, chase, EffectPlayer
+
+
+class _NullStream:
+
+    def __init__(self):
+        self.frames = 0
+
+    def push(self, frame):
+        self.frames += 1
+
+
+def _garbage(stop):
+    while not stop.is_set():
+        items = [[i, {'n': i}] for i in range(1000)]
+        for a, b in zip(items, items[1:]):
+            a.append(b)
+            b.append(a)
+        sleep(0)
+
+
+def _naive(stream, frames, fps):
+    lateness = np.empty(len(frames))
+    start = monotonic()
+    for i, frame in enumerate(frames):
+        lateness[i] = monotonic() - (start + i / fps)
+        stream.push(frame)
+        sleep(1. / fps)
+    return lateness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zones', type=int, nargs=4, default=[4, 9, 4, 0], metavar=('LEFT', 'TOP', 'RIGHT', 'BOTTOM'))
+    parser.add_argument('--fps', type=float, default=50., help="frame rate")
+    parser.add_argument('-t', '--time', type=float, default=60., help="rendered time in seconds")
+    parser.add_argument('--play', type=float, default=3., help="played time in seconds")
+    args = parser.parse_args()
+    topology = dict(zip(SIDES, args.zones), layers='1')
+
+    effects = {
+        'fade': fade((0, 0, 0), (255, 128, 0), args.time),
+        'breathing': breathing((0, 128, 255), 4.),
+        'gradient': gradient(topology, [(255, 0, 0), (0, 255, 0), (0, 0, 255)], period=10.),
+        'chase': chase(topology, (255, 255, 255), period=2., width=2),
+    }
+    print(f"rendering {args.time:g}s at {args.fps:g} fps, {sum(args.zones)} zones")
+    for name, timeline in effects.items():
+        start = perf_counter()
+        frames = timeline.render(topology, args.fps, args.time)
+        elapsed = perf_counter() - start
+        print(f"  {name:<10} {len(frames):>6} frames {len(frames) / elapsed:>12.0f} frames/s")
+
+    frames = effects['gradient'].render(topology, args.fps, args.play)
+    stop = threading.Event()
+    thread = threading.Thread(target=_garbage, args=(stop,), daemon=True)
+    thread.start()
+    try:
+        naive = _naive(_NullStream(), frames, args.fps)
+        player = EffectPlayer(_NullStream(), args.fps)
+        player.play(frames)
+    finally:
+        stop.set()
+        thread.join()
+    print(f"playing {len(frames)} frames at {args.fps:g} fps with garbage-producing thread")
+    for name, lateness in ('naive sleep', naive), ('EffectPlayer', player.lateness):
+        print(f"  {name:<13} lateness mean {1000 * lateness.mean():7.2f} ms, max {1000 * lateness.max():7.2f} ms, "
+              f"final {1000 * lateness[-1]:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Local fake Philips TV used by the benchmarks.
+
+It serves a subset of JointSpace API on HTTPS port 1926 of the given loopback address, optionally
+requiring digest authentication. A self-signed certificate is generated with the ``openssl`` tool.
+"""
+import os
+import ssl
+import json
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from philipstv.api.digest import parse_challenge
+
+_CERT = None
+
+
+def _certificate():
+    global _CERT
+    if _CERT is None:
+        folder = tempfile.mkdtemp(prefix='faketv-')
+        cert, key = os.path.join(folder, 'cert.pem'), os.path.join(folder, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert, '-days', '1',
+             '-subj', '/CN=faketv'],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        _CERT = cert, key
+    return _CERT
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _authorized(self):
+        tv = self.server.tv
+        if tv.user is None:
+            return True
+        params = parse_challenge(self.headers.get('Authorization'))
+        if params is None or params.get('nonce') != tv.nonce:
+            return False
+        md5 = lambda s: hashlib.md5(s.encode()).hexdigest()
+        ha1 = md5(f"{tv.user}:{tv.realm}:{tv.passwd}")
+        ha2 = md5(f"{self.command}:{params.get('uri')}")
+        return params.get('response') == md5(f"{ha1}:{tv.nonce}:{params.get('nc')}:{params.get('cnonce')}:auth:{ha2}")
+
+    def _send(self, code, body=None, headers=()):
+        data = b'' if body is None else json.dumps(body).encode()
+        lines = [f"HTTP/1.1 {code} {'OK' if code == 200 else 'Error'}", 'Content-Type: application/json',
+                 f"Content-Length: {len(data)}"]
+        lines += [f"{k}: {v}" for k, v in headers]
+        self.wfile.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + data)
+
+    def _handle(self):
+        tv = self.server.tv
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+        path = self.path[3:] if self.path.startswith('/6/') else self.path
+        tv.requests += 1
+        if path != 'system' and not self._authorized():
+            tv.challenges += 1
+            return self._send(401, None, [('WWW-Authenticate', f'Digest realm="{tv.realm}", nonce="{tv.nonce}", qop="auth"')])
+        if tv.delay:
+            threading.Event().wait(tv.delay)
+        try:
+            code, result = tv.handle(self.command, path, body)
+        except KeyError:
+            code, result = 404, {'error': 'not found'}
+        self._send(code, result)
+
+    do_GET = do_POST = _handle
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class FakeTV:
+    """Fake Philips TV server.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to '127.0.0.1'.
+        user (str, optional): Digest user name. If None, authorization is not required.
+        passwd (str, optional): Digest password.
+        topology (dict, optional): Ambilight topology.
+        delay (float, optional): Artificial processing delay of each request in seconds.
+    """
+
+    def __init__(self, host='127.0.0.1', user=None, passwd=None, topology=None, delay=0.):
+        self.host = host
+        self.user = user
+        self.passwd = passwd
+        self.realm = 'XTV'
+        self.nonce = os.urandom(8).hex()
+        self.delay = delay
+        self.requests = 0
+        self.challenges = 0
+        self.keys = []
+        self.state = {
+            'system': {'name': f"Fake TV {host}", 'model': 'FAKE', 'softwareversion': '1.0', 'api_version': {'Major': 6}},
+            'powerstate': {'powerstate': 'On'},
+            'audio/volume': {'muted': False, 'current': 10, 'min': 0, 'max': 60},
+            'activities/current': {'component': {'packageName': 'org.droidtv.playtv', 'className': 'PlayTvActivity'}},
+            'ambilight/topology': topology or {'layers': '1', 'left': 4, 'top': 9, 'right': 4, 'bottom': 0},
+            'ambilight/mode': {'current': 'internal'},
+            'ambilight/cached': {},
+            'ambilight/measured': {},
+            'ambilight/processed': {},
+        }
+        self._server = None
+
+    def handle(self, method, path, body):
+        if path == 'input/key':
+            self.keys.append(body['key'])
+            return 200, None
+        if path == 'strings':
+            return 200, {'translations': [
+                {'string_id': s['string_id'], 'string_translation': s['string_id'].rsplit('.', 1)[-1]} for s in body['strings']
+            ]}
+        if path == 'menuitems/settings/update':
+            return 200, None
+        if path == 'ambilight/cached' and method == 'POST':
+            for layer, sides in body.items():
+                for side, zones in sides.items():
+                    self.state['ambilight/cached'].setdefault(layer, {}).setdefault(side, {}).update(zones)
+            self.state['ambilight/measured'] = self.state['ambilight/processed'] = self.state['ambilight/cached']
+            return 200, None
+        if method == 'POST' and path in self.state:
+            self.state[path] = body
+            return 200, None
+        return 200, self.state[path]
+
+    def start(self):
+        """Start the server in a background thread."""
+        self._server = _Server((self.host, 1926), _Handler)
+        self._server.tv = self
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*_certificate())
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import sys
+    with FakeTV(*sys.argv[1:]) as tv:
+        input(f"Fake TV listening on https://{tv.host}:1926. Press enter to exit...\n")
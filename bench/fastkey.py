@@ -0,0 +1,54 @@
+"""Compare the raw fast path of sending remote keys with the generic requests path.
+
+Run with ``python -m bench.fastkey`` from the repository root.
+"""
+import argparse
+
+from time import perf_counter, process_time
+
+from philipstv.api import PhilipsAPI
+
+from .faketv import FakeTV
+
+KEYS = 'CursorUp', 'CursorDown', 'VolumeUp', 'VolumeDown', 'Confirm'
+
+
+def _measure(send, count):
+    wall, cpu = perf_counter(), process_time()
+    for i in range(count):
+        send(KEYS[i % len(KEYS)])
+    return (perf_counter() - wall) / count, (process_time() - cpu) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--count', type=int, default=1000, help="number of keys sent with every path")
+    parser.add_argument('--host', default='127.0.0.2', help="loopback address of the fake TV")
+    args = parser.parse_args()
+
+    with FakeTV(args.host, 'user', 'secret') as tv:
+        api = PhilipsAPI(args.host, 'user', 'secret')
+        api.send_key('Home')  # learn the nonce and open connections
+
+        def fast(key):
+            if not api._fast_keys.send(key):
+                raise RuntimeError("fast path fell back")
+
+        def generic(key):
+            api.post('input/key', {'key': key})
+
+        results = {}
+        for name, send in ('generic', generic), ('fast', fast), ('generic', generic), ('fast', fast):
+            results[name] = _measure(send, args.count)
+        challenges = tv.challenges
+
+    print(f"{args.count} keys per path, digest authentication, TLS on loopback")
+    print(f"{'path':<10} {'wall [ms/key]':>14} {'cpu [ms/key]':>14}")
+    for name, (wall, cpu) in results.items():
+        print(f"{name:<10} {1000 * wall:>14.3f} {1000 * cpu:>14.3f}")
+    print(f"speedup: {results['generic'][0] / results['fast'][0]:.1f}x wall, "
+          f"{results['generic'][1] / results['fast'][1]:.1f}x cpu; digest challenges: {challenges}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Measure memory footprint of TV handles and the shared connection pool.
+
+Memory allocated by creating the given numbers of :class:`TVHandle` and :class:`PhilipsAPI` objects is
+measured with ``tracemalloc``. Then handles of more fake TVs than the pool size are used, to show that the
+number of open connections stays bounded.
+
+Run with ``python -m bench.handles`` from the repository root.
+"""
+import gc
+import argparse
+import tracemalloc
+
+from philipstv.api import PhilipsAPI
+from philipstv.api.handle import TVHandle, ConnectionPool
+
+from .faketv import FakeTV
+
+
+def _host(i):
+    return f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'
+
+
+def _measure(factory, count):
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000], help="numbers of TVs")
+    parser.add_argument('--api-count', type=int, default=1000, help="maximum number of PhilipsAPI objects")
+    parser.add_argument('--tvs', type=int, default=40, help="number of fake TVs used with the pool")
+    parser.add_argument('--pool', type=int, default=16, help="connection pool size")
+    args = parser.parse_args()
+
+    def handle(i):
+        return TVHandle(_host(i), f'user{i:08x}', f'passwd{i:016x}', f'aa:bb:cc:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}')
+
+    def api(i):
+        return PhilipsAPI(_host(i), f'user{i:08x}', f'passwd{i:016x}', f'aa:bb:cc:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}')
+
+    print(f"{'objects':<12} {'count':>6} {'total [kB]':>11} {'per TV [B]':>11}")
+    for count in args.counts:
+        size = _measure(handle, count)
+        print(f"{'TVHandle':<12} {count:>6} {size / 1024:>11.0f} {size / count:>11.0f}")
+    for count in args.counts:
+        if count > args.api_count:
+            continue
+        size = _measure(api, count)
+        print(f"{'PhilipsAPI':<12} {count:>6} {size / 1024:>11.0f} {size / count:>11.0f}")
+
+    tvs = [FakeTV(f'127.0.4.{i + 1}', 'user', 'secret').start() for i in range(args.tvs)]
+    try:
+        pool = ConnectionPool(max_hosts=args.pool)
+        handles = [TVHandle(tv.host, 'user', 'secret') for tv in tvs]
+        for _ in range(2):
+            for h in handles:
+                h.get_system(pool=pool)
+                h.send_key('Home', pool=pool)
+        print(f"pool of {args.pool}: {pool.open_hosts()} TVs with open connections after using {len(handles)} TVs")
+        pool.close()
+    finally:
+        for tv in tvs:
+            tv.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Measure the video-to-ambilight pipeline on a synthetic clip.
+
+Frames of a synthetic clip (moving color gradients) are generated in the worker processes, which stands
+in for decoding, and their zone colors are extracted. No video files, decoders or TVs are needed.
+
+Run with ``python -m bench.pipeline`` from the repository root.
+"""
+import os
+import argparse
+
+from time import perf_counter
+
+import numpy as np
+
+from philipstv.api.ambilight import SIDES
+from philipstv.api.video import AmbilightPipeline, ZoneExtractor
+
+
+class SyntheticClip:
+    """Clip of moving color gradients."""
+
+    def __init__(self, count, width, height):
+        self.count = count
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return self.count
+
+    def read(self, start, stop):
+        y = np.linspace(0, 1, self.height, dtype=np.float32)[:, None]
+        x = np.linspace(0, 1, self.width, dtype=np.float32)[None, :]
+        image = np.empty((self.height, self.width, 3), np.uint8)
+        for index in range(start, stop):
+            phase = index / 30.
+            image[..., 0] = 255 * (0.5 + 0.5 * np.sin(2 * np.pi * (x + phase)))
+            image[..., 1] = 255 * (0.5 + 0.5 * np.sin(2 * np.pi * (y + phase)))
+            image[..., 2] = 255 * (x * y)
+            yield image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--frames', type=int, default=300, help="number of frames")
+    parser.add_argument('--size', type=int, nargs=2, default=[1280, 720], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--zones', type=int, nargs=4, default=[4, 9, 4, 0], metavar=('LEFT', 'TOP', 'RIGHT', 'BOTTOM'))
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    topology = dict(zip(SIDES, args.zones), layers='1')
+    clip = SyntheticClip(args.frames, *args.size)
+
+    # Check extraction on a frame with known colors at the edges
+    image = np.zeros((720, 1280, 3), np.uint8)
+    image[:, :640] = 255, 0, 0
+    image[:, 640:] = 0, 0, 255
+    zones = ZoneExtractor(topology)(image)
+    assert (zones[0, 0, :topology['left']] == (255, 0, 0)).all()
+    assert (zones[0, 2, :topology['right']] == (0, 0, 255)).all()
+
+    print(f"{args.frames} synthetic {args.size[0]}x{args.size[1]} frames, {sum(args.zones)} zones, "
+          f"{os.cpu_count()} CPUs")
+    start = perf_counter()
+    frames = sum(1 for _ in clip.read(0, args.frames))
+    generate = perf_counter() - start
+    print(f"{'generating frames only':<24} {frames / generate:8.1f} fps")
+    extract = ZoneExtractor(topology)
+    start = perf_counter()
+    for image in clip.read(0, args.frames):
+        extract(image)
+    print(f"{'in-process, no pool':<24} {args.frames / (perf_counter() - start):8.1f} fps")
+    for workers in args.workers:
+        pipeline = AmbilightPipeline(clip, topology, workers=workers)
+        start = perf_counter()
+        count = sum(1 for _ in pipeline.frames())
+        print(f"{f'pipeline, {workers} workers':<24} {count / (perf_counter() - start):8.1f} fps")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Measure throughput of the fleet status poller.
+
+Fake TVs are served from a separate process on loopback addresses ``127.0.2.x`` and polled continuously
+for the given time. Each poll reads system info, power state, volume and current activity.
+
+Run with ``python -m bench.poller`` from the repository root.
+"""
+import time
+import argparse
+import multiprocessing
+
+from philipstv.api.poller import StatusPoller
+
+from .faketv import FakeTV
+
+
+def _serve(hosts, ready, done):
+    tvs = [FakeTV(host, 'user', 'secret').start() for host in hosts]
+    ready.set()
+    done.wait()
+    for tv in tvs:
+        tv.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tvs', type=int, default=50, help="number of fake TVs")
+    parser.add_argument('-c', '--concurrency', type=int, default=64, help="maximum number of TVs polled at once")
+    parser.add_argument('-t', '--time', type=float, default=5.0, help="measurement time in seconds")
+    parser.add_argument('-i', '--interval', type=float, default=0.0, help="polling interval of every TV")
+    args = parser.parse_args()
+
+    hosts = [f'127.0.2.{i + 1}' for i in range(args.tvs)]
+    ready, done = multiprocessing.Event(), multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(hosts, ready, done), daemon=True)
+    server.start()
+    ready.wait()
+
+    changes = []
+    poller = StatusPoller.from_auth({host: ('user', 'secret') for host in hosts},
+                                    interval=args.interval, concurrency=args.concurrency)
+    poller.subscribe(lambda host, diff: changes.append(host))
+    try:
+        with poller:
+            time.sleep(1.0)  # warm up: connections, digest challenges, round-trip times
+            polls, start = poller.polls, time.perf_counter()
+            time.sleep(args.time)
+            polls, elapsed = poller.polls - polls, time.perf_counter() - start
+    finally:
+        done.set()
+        server.join()
+
+    reads = len(poller.reads)
+    print(f"{args.tvs} TVs, concurrency {args.concurrency}, interval {args.interval:g}s, {reads} reads per poll")
+    print(f"{polls / elapsed:.0f} polls/s ({reads * polls / elapsed:.0f} requests/s) over {elapsed:.1f}s")
+    print(f"change notifications: {len(changes)} (initial snapshots of {len(set(changes))} TVs)")
+
+
+if __name__ == '__main__':
+    main()
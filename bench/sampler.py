@@ -0,0 +1,72 @@
+"""Measure ambilight sampling rate, recording size and color latency.
+
+Colors of a fake TV are sampled as fast as it responds, while frames with a changing color are streamed
+to it. The sampling rate, recording size per sample and the time from pushing a frame to seeing its colors
+in the samples are reported. The recording size includes its header.
+
+Run with ``python -m bench.sampler`` from the repository root.
+"""
+import os
+import argparse
+import tempfile
+
+from time import monotonic, time, sleep
+
+import numpy as np
+
+from philipstv.api import PhilipsAPI
+from philipstv.api.ambilight import AmbilightStream
+from philipstv.api.sampler import AmbilightSampler, load_recording
+
+from .faketv import FakeTV
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-t', '--time', type=float, default=3.0, help="measurement time in seconds")
+    parser.add_argument('--rate', type=float, default=0., help="sampling rate limit (0 for no limit)")
+    parser.add_argument('--fps', type=float, default=10., help="rate of streamed color changes")
+    parser.add_argument('--latency', type=float, default=0.005, help="fake TV latency")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='ambisample-'), 'recording.bin')
+    pushed = []
+    with FakeTV('127.0.0.8', 'user', 'secret', delay=args.latency) as tv:
+        sampler = AmbilightSampler(PhilipsAPI(tv.host, 'user', 'secret'), capacity=4096, rate=args.rate or None)
+        stream = AmbilightStream(PhilipsAPI(tv.host, 'user', 'secret'), rate=50.)
+        stream.start()
+        sampler.start()
+        sampler.record(path)
+        start = monotonic()
+        i = 0
+        while monotonic() - start < args.time:
+            i += 1
+            stream.frame.fill(i % 256, 0, 0)
+            pushed.append((time(), i % 256))
+            stream.push()
+            sleep(max(start + i / args.fps - monotonic(), 0))
+        elapsed = monotonic() - start
+        sampler.stop()
+        stream.stop()
+
+    topology, times, colors = load_recording(path)
+    size = os.path.getsize(path)
+    latencies = []
+    for when, value in pushed:
+        seen = np.flatnonzero((times >= when) & (colors[:, 0, 0] == value))
+        if len(seen):
+            latencies.append(times[seen[0]] - when)
+    segments = sampler.segments()
+    print(f"{sampler.count} samples in {elapsed:.1f}s: {sampler.count / elapsed:.0f} samples/s, "
+          f"{colors.shape[1]} zones, fake TV latency {1000 * args.latency:g} ms")
+    record = 8 + 3 * colors.shape[1]
+    print(f"recording: {len(times)} samples, {size} bytes: header {size - record * len(times)} bytes, "
+          f"{record} bytes/sample, {size / max(len(times), 1):.1f} bytes/sample including header")
+    print(f"ring buffer: {sum(len(t) for t, _ in segments)} samples in {len(segments)} zero-copy segment(s)")
+    if latencies:
+        print(f"push-to-sample latency: median {1000 * np.median(latencies):.1f} ms, "
+              f"max {1000 * np.max(latencies):.1f} ms ({len(latencies)} of {len(pushed)} frames seen)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Measure the time of subnet-scan discovery of a /24 network.
+
+By default a few fake TVs are started on loopback addresses and ``127.0.0.0/24`` is scanned, where every other
+address refuses connections immediately. Give ``--network`` to scan a real network instead, where silent
+addresses are limited by the probe deadline.
+
+Run with ``python -m bench.scan`` from the repository root.
+"""
+import argparse
+
+from philipstv.api.scan import SubnetScanner
+
+from .faketv import FakeTV
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--network', help="network to scan instead of the loopback one")
+    parser.add_argument('--tvs', type=int, default=4, help="number of fake TVs on loopback")
+    parser.add_argument('-c', '--concurrency', type=int, default=128, help="maximum number of simultaneous probes")
+    parser.add_argument('--timeout', type=float, default=1.0, help="deadline of a single probe")
+    args = parser.parse_args()
+
+    tvs = []
+    if args.network is None:
+        tvs = [FakeTV(f'127.0.0.{10 + 60 * i}') for i in range(args.tvs)]
+        for tv in tvs:
+            tv.start()
+    try:
+        scanner = SubnetScanner([args.network or '127.0.0.0/24'], concurrency=args.concurrency, timeout=args.timeout)
+        count = sum(1 for _ in scanner.addresses())
+        found = scanner.run()
+    finally:
+        for tv in tvs:
+            tv.stop()
+
+    print(f"scanned {count} addresses of {', '.join(map(str, scanner.networks))} "
+          f"with {args.concurrency} concurrent probes")
+    print(f"found {len(found)} TVs in {scanner.elapsed:.3f}s ({count / scanner.elapsed:.0f} probes/s)")
+    for name, ip in sorted(found, key=lambda item: tuple(map(int, item[1].split('.')))):
+        print(f"  {ip:<15} {name}")
+
+
+if __name__ == '__main__':
+    main()
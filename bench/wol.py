@@ -0,0 +1,80 @@
+"""Measure throughput of bulk Wake-on-LAN.
+
+Magic packets for the given number of MACs are sent by unicast to a local UDP receiver, once with
+a new socket per packet (``send_magic_packet``) and once with :class:`WakeOnLan`.
+
+Run with ``python -m bench.wol`` from the repository root.
+"""
+import socket
+import argparse
+import threading
+
+from time import perf_counter
+
+from philipstv.api.wol import WakeOnLan, send_magic_packet
+
+
+def _macs(count):
+    return [f'02:00:00:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}' for i in range(count)]
+
+
+class _Receiver:
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.5)
+        self.port = self.sock.getsockname()[1]
+        self.count = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if len(self.sock.recv(256)) == 102:
+                    self.count += 1
+            except socket.timeout:
+                return
+
+    def wait(self):
+        self._thread.join()
+        self.sock.close()
+        return self.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--count', type=int, default=1000, help="number of MACs")
+    parser.add_argument('--repeats', type=int, default=3, help="number of times each packet is sent")
+    parser.add_argument('--rate', type=float, default=0., help="packets per second limit (0 for no limit)")
+    args = parser.parse_args()
+    macs = _macs(args.count)
+
+    receiver = _Receiver()
+    start = perf_counter()
+    for _ in range(args.repeats):
+        for mac in macs:
+            send_magic_packet(mac, '127.0.0.1', receiver.port)
+    single = perf_counter() - start
+    single_received = receiver.wait()
+
+    receiver = _Receiver()
+    with WakeOnLan(receiver.port, args.repeats, interval=0., rate=args.rate or None) as wol:
+        start = perf_counter()
+        packets = wol.prepare((mac, '127.0.0.1') for mac in macs)
+        prepared = perf_counter() - start
+        sent = wol.send(packets)
+        bulk = perf_counter() - start
+    bulk_received = receiver.wait()
+
+    total = args.count * args.repeats
+    print(f"{args.count} MACs x {args.repeats} repeats = {total} packets")
+    print(f"send_magic_packet: {single * 1000:8.1f} ms  {total / single:9.0f} packets/s  received {single_received}")
+    print(f"WakeOnLan:         {bulk * 1000:8.1f} ms  {sent / bulk:9.0f} packets/s  received {bulk_received} "
+          f"(preparing packets {prepared * 1000:.1f} ms)")
+
+
+if __name__ == '__main__':
+    main()
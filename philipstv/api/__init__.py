@@ -5,10 +5,23 @@ import requests
 # from base64 import b64encode, b64decode
 # import hashlib, hmac
 
-from time import sleep
-from requests.auth import HTTPDigestAuth
+import threading
+
+from time import sleep, monotonic
+from contextlib import contextmanager
+from requests.auth import AuthBase
+from urllib.parse import urlparse
 
 from .wol import send_magic_packet
+from .batch import RequestBatcher
+from .cache import firmware_id
+from .rtt import RttEstimator, endpoint_class
+from .health import HealthMonitor, CLOSED
+from .digest import DigestStore
+from .tls import TLSAdapter, ResumingSSLContext
+from .fastkey import FastKeySender
+
+requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
 
 class NoHost(Exception):
@@ -40,20 +53,198 @@ class ApiError(requests.RequestException):
             return super().__str__()
 
 
+def wake_and_wait(host, mac=None, timeout=20.0, interval=0.5, probe=None):
+    """Turn on the TV using Wake on LAN and wait until it is ready.
+
+    Magic packets are re-sent with growing intervals from a background thread, while the TV port is probed
+    concurrently. As soon as the port accepts connections, the TV system info is requested and the function
+    returns when the TV answers.
+
+    Args:
+        host (str): Hostname or IP of the TV.
+        mac (str, optional): MAC address of the TV. If None, the TV is only waited for.
+        timeout (float, optional): Maximum time to wait in seconds. Defaults to 20.
+        interval (float, optional): Initial interval between magic packets. Defaults to 0.5.
+        probe (function, optional): Function called with a timeout, which requests the TV system info and returns
+                                    True if the TV answered. By default a new connection is used.
+
+    Returns:
+        bool: True if the TV is ready, False if it did not answer in time.
+    """
+    if probe is None:
+        def probe(timeout):
+            return requests.get(f"https://{host}:1926/6/system", verify=False, timeout=timeout).status_code == 200
+
+    done = threading.Event()
+
+    def wake(interval):
+        while True:
+            send_magic_packet(mac)
+            if done.wait(interval):
+                return
+            interval = min(2 * interval, 4.0)
+
+    if mac:
+        threading.Thread(target=wake, args=(interval,), name='philipstv-wake', daemon=True).start()
+    deadline = monotonic() + timeout
+    try:
+        while True:
+            left = deadline - monotonic()
+            if left <= 0:
+                return False
+            try:
+                with socket.create_connection((host, 1926), timeout=min(0.25, left)):
+                    pass
+            except OSError:
+                sleep(max(min(0.05, deadline - monotonic()), 0))
+                continue
+            try:
+                if probe(max(min(1.0, deadline - monotonic()), 0.05)):
+                    return True
+            except requests.RequestException:
+                pass
+    finally:
+        done.set()
+
+
+class DigestAuth(AuthBase):
+    """Requests digest authentication with state kept in :class:`DigestStore`.
+
+    Unlike ``requests.auth.HTTPDigestAuth``, requests are authorized preemptively with the nonce known from
+    the previous requests to the same host. If the server rejects it, the new challenge is stored and
+    the request is resent once.
+
+    Args:
+        store (DigestStore): Digest authentication state.
+        user (str): User name.
+        passwd (str): User password.
+    """
+
+    def __init__(self, store, user, passwd):
+        self.store = store
+        self.user = user
+        self.passwd = passwd
+
+    def __call__(self, r):
+        host = urlparse(r.url).hostname
+        header = self.store.authorization(host, self.user, self.passwd, r.method, r.path_url)
+        if header is not None:
+            r.headers['Authorization'] = header
+        r.register_hook('response', self._handle_401)
+        return r
+
+    def _handle_401(self, r, **kwargs):
+        if r.status_code != 401 or getattr(r.request, '_digest_retry', False):
+            return r
+        host = urlparse(r.url).hostname
+        if not self.store.update(host, self.user, self.passwd, r.headers.get('www-authenticate')):
+            return r
+        r.content
+        r.close()
+        prep = r.request.copy()
+        prep._digest_retry = True
+        prep.headers['Authorization'] = self.store.authorization(host, self.user, self.passwd, prep.method, prep.path_url)
+        resp = r.connection.send(prep, **kwargs)
+        resp.history.append(r)
+        resp.request = prep
+        return resp
+
+
+def _settings_results(settings, resp):
+    """Extract per-node results from the response to settings update."""
+    results = dict.fromkeys(settings)
+    if isinstance(resp, dict):
+        for val in resp.get('values', []):
+            try:
+                value = val['value']
+                results[value['Nodeid']] = value
+            except (KeyError, TypeError):
+                pass
+    return results
+
+
+class SettingsTransaction:
+    """Batch of settings updates sent to the TV in a single request.
+
+    Use it as a context manager. Updates are collected in the block and sent when it exits without exception::
+
+        with api.settings_transaction() as transaction:
+            transaction[api.AMBILIGHT_STYLE] = {'activenode_id': api.AMBILIGHT_MENU_FOLLOW_VIDEO}
+            transaction[api.AMBILIGHT_MENU_FOLLOW_VIDEO] = {'selected_item': 100}
+        print(transaction.results)
+
+    Args:
+        api (PhilipsAPI): API object used to send the updates.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.settings = {}
+        self.results = None
+        """Per-node results returned by :meth:`PhilipsAPI.update_settings` after commit."""
+
+    def __setitem__(self, node, data):
+        self.settings[node] = data
+
+    def update(self, node, data):
+        """Add settings node update to the transaction.
+
+        Args:
+            node (int): Settings node number.
+            data: Settings value.
+        """
+        self.settings[node] = data
+
+    def commit(self):
+        """Send all collected updates.
+
+        Returns:
+            dict: Dict with node numbers and update results.
+        """
+        if self.settings:
+            self.results = self.api.update_settings(self.settings)
+        else:
+            self.results = {}
+        self.settings = {}
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.commit()
+
+
 class PhilipsAPI:
     """Philips TV HTTP API access class.
 
     This class provides access to Philips API. It can be used without GUI for script access.
+    It is safe to use from several threads: requests are sent one at a time over a single keep-alive connection.
 
     Args:
         host (str, optional): Hostname or IP of the TV. Defaults to None.
         user (str, optional): HTTP user name. Defaults to None.
         passwd (str, optional): HTTP user password. Defaults to None.
         mac (str, optional): MAC address of the TV. Used for Wake on LAN.. Defaults to None.
-        timeout (float, optional): Default connection timeout in seconds. Defaults to 0.5.
-        waketime (float, optional): Default time to wait after wakeup in seconds. Defaults to 0.5.
-        repeats (int, optional): Number of connection attempts. In each try the timeout and waketime are doubled.
+        timeout (float, optional): Default connection timeout in seconds, used until round-trip time to the TV
+                                   is measured. Defaults to 0.5.
+        waketime (float, optional): Time to wait after sending the magic packet in :meth:`wakeup`, which does not
+                                    check if the TV is ready. Defaults to 0.5.
+        repeats (int, optional): Maximum number of connection attempts. In each try the timeout is doubled.
+                                 Before retrying, the TV is woken up if its MAC is known and the request
+                                 waits until it is ready (see :meth:`wake_and_wait`).
                                  You should not make it smaller than 2 or the WoL will not work. Defaults to 3.
+        wake_timeout (float, optional): Maximum time to wait for the TV to wake up in seconds. Defaults to 20.
+        strings_cache (StringsCache, optional): Persistent cache for translation strings. Defaults to None.
+        rtt (RttEstimator, optional): Round-trip time estimator used to compute timeouts and number of attempts.
+                                      By default a new one, not stored on disk, is created.
+        health (HealthMonitor, optional): Circuit breaker used to fail fast, when the TV is known to be down and
+                                          it cannot be woken up. By default a new one is created.
+        digest (DigestStore, optional): Digest authentication state. By default a new one, not stored on disk,
+                                        is created.
+        fast_keys (bool, optional): Send remote keys over a raw persistent socket, falling back to the generic
+                                    path if the request cannot be sent. Defaults to True.
 
     Raises:
         NoHost: No TV address specified.
@@ -74,30 +265,62 @@ class PhilipsAPI:
     AMBILIGHT_LIGHTNESS = 2131230795
     AMBILIGHT_SATURATION = 2131230796
 
-    def __init__(self, host=None, user=None, passwd=None, mac=None, timeout=0.5, waketime=0.5, repeats=3):
+    def __init__(self, host=None, user=None, passwd=None, mac=None, timeout=0.5, waketime=0.5, repeats=3,
+                 wake_timeout=20.0, strings_cache=None, rtt=None, health=None, digest=None, fast_keys=True):
         self._host = host
         self._user = user
         self._passwd = passwd
         self._timeout = timeout
         self._waketime = waketime
         self._repeats = repeats
+        self._wake_timeout = wake_timeout
 
         self.mac = mac
         """MAC address of the TV. Used for Wake on LAN."""
 
+        self.strings_cache = strings_cache
+        """Persistent cache for translation strings."""
+
+        self.rtt = rtt if rtt is not None else RttEstimator(initial=timeout)
+        """Round-trip time estimator."""
+
+        self.health = health if health is not None else HealthMonitor()
+        """Circuit breaker tracking TV reachability."""
+
+        self._digest = digest if digest is not None else DigestStore()
         self._create_auth()
+        self._firmware = {}
+
+        self._settings_batcher = RequestBatcher(self._fetch_settings)
+        self._strings_batcher = RequestBatcher(self._fetch_strings)
 
-        requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+        # Requests from different threads (GUI, key queue, keep-alive...) share one connection and digest nonce,
+        # so they are sent one at a time
+        self._lock = threading.RLock()
+        self._local = threading.local()
         self._session = requests.Session()
         self._session.verify = False
-        self._session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1))
+        self._ssl_context = ResumingSSLContext()
+        self._session.mount('https://', TLSAdapter(self._ssl_context, pool_connections=1))
+        self._fast_keys = FastKeySender(self) if fast_keys else None
+        self._keep_alive = None
 
     def _create_auth(self):
         if self._user is not None:
-            self._auth = HTTPDigestAuth(self._user, self._passwd)
+            self._auth = DigestAuth(self._digest, self._user, self._passwd)
         else:
             self._auth = None
 
+    @property
+    def digest(self):
+        """Digest authentication state."""
+        return self._digest
+
+    @digest.setter
+    def digest(self, digest):
+        self._digest = digest
+        self._create_auth()
+
     @property
     def host(self):
         """Hostname or IP of the TV."""
@@ -128,6 +351,68 @@ class PhilipsAPI:
         self._passwd = passwd
         self._create_auth()
 
+    def warm(self, timeout=None):
+        """Open connection to the TV in advance.
+
+        A light request is sent to the TV, so the TLS connection is established and the digest nonce is known
+        before the first real command. The TV is not woken up if it is asleep.
+
+        Args:
+            timeout (float, optional): Timeout. If missing, class defaults are used.
+
+        Returns:
+            bool: True if the TV answered.
+        """
+        host = self._host
+        if not host: return False
+        if timeout is None: timeout = 2 * self.rtt.timeout(host, 'system')
+        path = 'powerstate' if self._auth is not None else 'system'
+        try:
+            with self._lock:
+                resp = self._session.get(f"https://{host}:1926/6/{path}", verify=False, auth=self._auth, timeout=timeout)
+        except requests.RequestException:
+            return False
+        return resp.status_code == 200
+
+    def keep_alive(self, interval=10.0, immediate=True):
+        """Keep connection to the TV open in the background.
+
+        The connection is warmed every `interval` seconds, so it is not closed by the TV as idle. The requests
+        share the lock of all other requests, so they never interleave with commands sent from other threads.
+        Call with None interval to stop.
+
+        Args:
+            interval (float, optional): Interval between requests in seconds. Defaults to 10.
+            immediate (bool, optional): Warm the connection immediately. Set to False if the caller warms it
+                                        itself. Defaults to True.
+        """
+        if self._keep_alive is not None:
+            self._keep_alive.set()
+            self._keep_alive = None
+        if interval is None:
+            return
+        stop = self._keep_alive = threading.Event()
+
+        def run():
+            if immediate:
+                self.warm()
+            while not stop.wait(interval):
+                self.warm()
+
+        threading.Thread(target=run, name='philipstv-keepalive', daemon=True).start()
+
+    def close(self):
+        """Stop background activity and close connections to the TV.
+
+        Keep-alive and the probes of :attr:`health` monitor are stopped. If the monitor is shared with other
+        API objects, it stops probing for them as well.
+        """
+        self.keep_alive(None)
+        self.health.close()
+        if self._fast_keys is not None:
+            self._fast_keys.close()
+        self._session.close()
+
     def wakeup(self, waketime=None):
         """Turn on the TV using Wake on LAN.
 
@@ -139,29 +424,94 @@ class PhilipsAPI:
             send_magic_packet(self.mac)
             sleep(waketime)
 
-    def _process(self, oper, path, timeout, auth, **kwargs):
+    def wake_and_wait(self, timeout=None, interval=0.5):
+        """Turn on the TV using Wake on LAN and wait until it is ready.
+
+        Magic packets are re-sent with growing intervals from a background thread, while the TV is probed
+        concurrently. The function returns as soon as the TV answers. See :func:`wake_and_wait`.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds. If None, class defaults are used.
+            interval (float, optional): Initial interval between magic packets. Defaults to 0.5.
+
+        Returns:
+            bool: True if the TV is ready, False if it did not answer in time.
+        """
         if not self._host: raise NoHost()
-        if timeout is None: timeout = self._timeout
-        waketime = self._waketime
+        if timeout is None: timeout = self._wake_timeout
+        host = self._host
+
+        def probe(timeout):
+            with self._lock:
+                resp = self._session.get(f"https://{host}:1926/6/system", verify=False, timeout=timeout)
+            return resp.status_code == 200
+
+        return wake_and_wait(host, self.mac, timeout, interval, probe)
+
+    @contextmanager
+    def deadline(self, seconds):
+        """Limit the time of all requests sent by the current thread in the block.
+
+        Request timeouts and waiting for the TV to wake up are cut to the time left, and once it runs out,
+        further requests fail with :class:`NotRechable`::
+
+            with api.deadline(2.0):
+                api.send_key('Standby')
+
+        Args:
+            seconds (float): Time limit in seconds.
+        """
+        previous = getattr(self._local, 'deadline', None)
+        end = monotonic() + seconds
+        self._local.deadline = end if previous is None else min(previous, end)
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+
+    def _remaining(self, timeout):
+        # Cut timeout to the time left before the deadline of the current thread
+        end = getattr(self._local, 'deadline', None)
+        if end is None:
+            return timeout
+        left = end - monotonic()
+        if left <= 0:
+            raise NotRechable()
+        return min(timeout, left)
+
+    def _process(self, oper, path, timeout, auth, retry=True, **kwargs):
+        host = self._host
+        if not host: raise NoHost()
+        cls = endpoint_class(path)
+        if timeout is None: timeout = self.rtt.timeout(host, cls)
         if auth is None:
             auth = self._auth
         elif not auth:
             auth = None
-        last = self._repeats - 1
-        for i in range(self._repeats):
-            try:
-                resp = oper(f"https://{self._host}:1926/6/{path}", verify=False, auth=auth, timeout=timeout, **kwargs)
-            except requests.Timeout as err:
-                if i != last:
-                    self.wakeup(waketime)
+        # Fail before taking the half-open trial slot if the deadline has already passed
+        self._remaining(timeout)
+        if (not self.mac or not retry) and not self.health.allow(host):
+            raise NotRechable()
+        repeats = self.rtt.attempts(host, cls, self._repeats) if retry else 1
+        last = repeats - 1
+        reported = False
+        try:
+            for i in range(repeats):
+                try:
+                    with self._lock:
+                        resp = oper(f"https://{host}:1926/6/{path}", verify=False, auth=auth,
+                                    timeout=self._remaining(timeout), **kwargs)
+                except requests.Timeout as err:
+                    if i == last or self.mac and not self.wake_and_wait(self._remaining(self._wake_timeout)):
+                        raise NotRechable() from err
                     timeout *= 2
-                    waketime *= 2
-                else:
+                    continue
+                except requests.ConnectionError as err:
                     raise NotRechable() from err
-                continue
-            except requests.ConnectionError as err:
-                raise NotRechable() from err
-            else:
+                reported = True
+                self.health.success(host)
+                if i == 0:
+                    self.rtt.sample(host, cls, resp.elapsed.total_seconds())
                 if resp.status_code == 200:
                     try:
                         return resp.json()
@@ -170,32 +520,44 @@ class PhilipsAPI:
                 elif resp.status_code == 401:
                     raise NotAuthorized()
                 raise ApiError(response=resp)
+        finally:
+            # Every request without an answer counts as a failure, so the half-open trial slot is always released
+            if not reported:
+                self.health.failure(host)
 
-    def get(self, path, timeout=None, auth=None):
+    def get(self, path, timeout=None, auth=None, retry=True):
         """Generic GET request.Request
 
         Args:
             path (str): API path.
             timeout (float, optional): Timeout. If missing, class defauls is used.
             auth (optional): Requests auth object. If False, the request is not authorized.
+            retry (bool, optional): Retry timed out request, waking the TV up if its MAC is known. If False,
+                                    the request is sent once and the TV is never woken up. Defaults to True.
 
         Returns:
             Response JSON.
         """
-        return self._process(self._session.get, path, timeout, auth)
+        return self._process(self._session.get, path, timeout, auth, retry)
 
-    def post(self, path, body, timeout=None, auth=None):
+    def post(self, path, body, timeout=None, auth=None, retry=True):
         """Generic POST request.Request
 
         Args:
             path (str): API path.
+            body: Request JSON. It can also be bytes with already encoded JSON.
             timeout (float, optional): Timeout. If missing, class defauls is used.
             auth (optional): Requests auth object. If False, the request is not authorized.
+            retry (bool, optional): Retry timed out request, waking the TV up if its MAC is known. If False,
+                                    the request is sent once and the TV is never woken up. Defaults to True.
 
         Returns:
             Response JSON.
         """
-        return self._process(self._session.post, path, timeout, auth, json=body)
+        if isinstance(body, bytes):
+            return self._process(self._session.post, path, timeout, auth, retry, data=body,
+                                 headers={'Content-Type': 'application/json'})
+        return self._process(self._session.post, path, timeout, auth, retry, json=body)
 
     def pair_request(self):
         """Initiate pairing process.
@@ -237,7 +599,7 @@ class PhilipsAPI:
             'auth_signature': 'authsignature'
         }
         grant_data = {'auth': auth, 'device': device}
-        resp = self.post('pair/grant', grant_data, auth=HTTPDigestAuth(user, passwd))
+        resp = self.post('pair/grant', grant_data, auth=DigestAuth(self._digest, user, passwd))
         if resp is None or resp['error_id'] != 'SUCCESS':
             raise ApiError(response=resp)
         self._user = user
@@ -269,17 +631,24 @@ class PhilipsAPI:
                            Teletext, Subtitle, ChannelStepUp, ChannelStepDown, Source, AmbilightOnOff, Online,
                            PlayPause, Play, Pause, FastForward, Stop, Rewind, Record
         """
+        if self._fast_keys is not None and self.health.state(self._host) == CLOSED and self._fast_keys.send(key):
+            return
         self.post('input/key', {'key': key})
 
+    def _fetch_settings(self, group, nodes):
+        data = self.post('menuitems/settings/current', {'nodes': [{'nodeid': node} for node in nodes]})
+        if not data: return {}
+        return {val['value']['Nodeid']: val['value'] for val in data.get('values', [])}
+
     def get_settings(self, *nodes):
         """Get current value of given settings nodes.
 
+        Concurrent calls from different threads are merged into a single request.
+
         Returns:
             dict: Dict with node numbers and setting values.
         """
-        data = self.post('menuitems/settings/current', {'nodes': [{'nodeid': node} for node in nodes]})
-        if not data: return {}
-        return {val['value']['Nodeid']: val['value'] for val in data.get('values', [])}
+        return self._settings_batcher.get(self._host, nodes)
 
     def update_setting(self, node, data):
         """Update given settings node.
@@ -288,7 +657,30 @@ class PhilipsAPI:
             node (int): Settings node number.
             data: Settings value.
         """
-        self.post('menuitems/settings/update', {'values': [{'value': {'Nodeid': node, 'data': data}}]})
+        self.update_settings({node: data})
+
+    def update_settings(self, settings):
+        """Update several settings nodes in a single request.
+
+        Args:
+            settings (dict): Dict with node numbers and settings values.
+
+        Returns:
+            dict: Dict with node numbers and update results reported by the TV. Nodes, for which the TV did not
+                  report anything, have None value.
+        """
+        resp = self.post(
+            'menuitems/settings/update', {'values': [{'value': {'Nodeid': node, 'data': data}} for node, data in settings.items()]}
+        )
+        return _settings_results(settings, resp)
+
+    def settings_transaction(self):
+        """Create a batch of settings updates sent in a single request.
+
+        Returns:
+            SettingsTransaction: New transaction to be used as a context manager.
+        """
+        return SettingsTransaction(self)
 
     def get_system(self):
         """Get system info from your TV.TV
@@ -360,6 +752,9 @@ class PhilipsAPI:
             country (str, optional): Country code. Defaults to 'en_US'.
             lang (str, optional): Language code. By default determined from country code.
 
+        Concurrent calls from different threads for the same locale are merged into a single request.
+        If :attr:`strings_cache` is set, only strings missing in the cache are requested from the TV.
+
         Returns:
             dict: Dict with string IDs and retrieved translations.
         """
@@ -368,6 +763,79 @@ class PhilipsAPI:
                 lang = country.split('_')[1]
             except:
                 lang = 'en'
+        cache = self.strings_cache
+        if cache is None:
+            return self._strings_batcher.get((self._host, country, lang), ids)
+        firmware = self._firmware_id()
+        result, missing = cache.get(firmware, country, lang, ids)
+        if missing:
+            fetched = self._strings_batcher.get((self._host, country, lang), missing)
+            cache.put(firmware, country, lang, fetched)
+            result.update(fetched)
+        return result
+
+    def _check_firmware(self, host):
+        # Only a cache key, so never wake the TV for it
+        firmware = firmware_id(self.get('system', retry=False))
+        self._firmware[host] = firmware
+        if self.strings_cache is not None:
+            self.strings_cache.set_firmware(host, firmware)
+        return firmware
+
+    def _firmware_id(self):
+        host = self._host
+        try:
+            return self._firmware[host]
+        except KeyError:
+            pass
+        firmware = self.strings_cache.firmware(host)
+        if firmware is None:
+            return self._check_firmware(host)
+        # Use the stored firmware now and verify it in the background
+        self._firmware[host] = firmware
+        threading.Thread(target=self._verify_firmware, args=(host,), daemon=True).start()
+        return firmware
+
+    def _verify_firmware(self, host):
+        try:
+            if host == self._host:
+                self._check_firmware(host)
+        except Exception:
+            self._firmware.pop(host, None)
+
+    def preload_strings(self, country='en_US', lang=None, ids=None):
+        """Fill the strings cache for the locale in the background.
+
+        Args:
+            country (str, optional): Country code. Defaults to 'en_US'.
+            lang (str, optional): Language code. By default determined from country code.
+            ids (list[str], optional): String IDs to load. By default, all strings cached for the TV firmware
+                                       in any locale are loaded.
+
+        Nothing is loaded if the TV does not answer, as it is never woken up for this.
+
+        Returns:
+            threading.Thread: Started background thread.
+        """
+        def preload():
+            # Do not turn on the TV just to fill the cache
+            if not self.warm():
+                return
+            try:
+                with self.strings_cache.batch():
+                    load = ids
+                    if load is None:
+                        load = self.strings_cache.known_ids(self._firmware_id())
+                    if load:
+                        self.get_strings(*load, country=country, lang=lang)
+            except Exception:
+                pass
+        thread = threading.Thread(target=preload, daemon=True)
+        thread.start()
+        return thread
+
+    def _fetch_strings(self, group, ids):
+        _, country, lang = group
         data = {'locale': {'country': country, 'language': lang}, 'strings': [{'string_id': s} for s in ids]}
         return {res['string_id']: res['string_translation'] for res in self.post('strings', data)['translations']}
 
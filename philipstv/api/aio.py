@@ -0,0 +1,681 @@
+import ssl
+import json
+import random
+import string
+import socket
+import asyncio
+import threading
+
+from time import monotonic
+from datetime import timedelta
+
+from . import PhilipsAPI, NoHost, NotRechable, NotAuthorized, ApiError, _settings_results
+from .digest import DigestStore
+from .wol import send_magic_packet
+from .rtt import RttEstimator, endpoint_class
+
+
+class BackgroundLoop:
+    """Coroutine run in its own event loop in a background thread.
+
+    Args:
+        name (str): Thread name.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    @property
+    def running(self):
+        """True if the coroutine is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, func, *args):
+        """Start coroutine function in a new thread, unless the previous one is still running.
+
+        Args:
+            func (function): Coroutine function.
+            args: Its arguments.
+        """
+        if self.running:
+            return
+        ready = threading.Event()
+
+        async def main():
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.current_task()
+            ready.set()
+            try:
+                await func(*args)
+            except asyncio.CancelledError:
+                pass
+
+        self._thread = threading.Thread(target=asyncio.run, args=(main(),), name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self):
+        """Cancel the coroutine and wait for the thread to finish."""
+        if self._thread is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        except RuntimeError:  # loop already closed
+            pass
+        self._thread.join()
+        self._thread = None
+
+
+class HTTPResponse:
+    """Minimal HTTP response returned by the asynchronous client.
+
+    It mimics the parts of ``requests.Response`` interface used in this package.
+    """
+
+    def __init__(self, status_code, reason, headers, content, elapsed=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def __repr__(self):
+        return f"<HTTPResponse [{self.status_code}]>"
+
+
+class _Connection:
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.used = False
+
+    @property
+    def closed(self):
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+    async def request(self, method, host, target, headers, body):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}:1926"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+        self.used = True
+
+        status = await self.reader.readline()
+        if not status:
+            raise ConnectionResetError("Connection closed by the TV")
+        _, code, *reason = status.decode('latin-1').rstrip().split(' ', 2)
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                content += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            content = bytes(content)
+        elif 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            content = await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return HTTPResponse(int(code), reason[0] if reason else '', headers, content)
+
+
+class AsyncPhilipsAPI:
+    """Asynchronous Philips TV HTTP API access class.
+
+    This class provides the same methods as :class:`PhilipsAPI`, but all of them are coroutines and all
+    network operations are done with non-blocking asyncio sockets. Thus a single event loop can control
+    many TVs at once.
+
+    Args:
+        host (str, optional): Hostname or IP of the TV. Defaults to None.
+        user (str, optional): HTTP user name. Defaults to None.
+        passwd (str, optional): HTTP user password. Defaults to None.
+        mac (str, optional): MAC address of the TV. Used for Wake on LAN.. Defaults to None.
+        timeout (float, optional): Default connection timeout in seconds, used until round-trip time to the TV
+                                   is measured. Defaults to 0.5.
+        waketime (float, optional): Time to wait after sending the magic packet in :meth:`wakeup`, which does not
+                                    check if the TV is ready. Defaults to 0.5.
+        repeats (int, optional): Maximum number of connection attempts. In each try the timeout is doubled.
+                                 Before retrying, the TV is woken up if its MAC is known and the request
+                                 waits until it is ready (see :meth:`wake_and_wait`).
+                                 You should not make it smaller than 2 or the WoL will not work. Defaults to 3.
+        wake_timeout (float, optional): Maximum time to wait for the TV to wake up in seconds. Defaults to 20.
+        max_connections (int, optional): Maximum number of simultaneous connections to the TV. Further requests
+                                         wait for a free connection. Defaults to 4.
+        rtt (RttEstimator, optional): Round-trip time estimator used to compute timeouts and number of attempts.
+                                      By default a new one, not stored on disk, is created.
+        digest (DigestStore, optional): Digest authentication state. By default a new one, not stored on disk,
+                                        is created.
+
+    Raises:
+        NoHost: No TV address specified.
+        NotRechable: TV not reachable.
+        NotAuthorized: No authorization.
+        ApiError: Some internal API error.
+    """
+
+    PICTURE_STYLE = PhilipsAPI.PICTURE_STYLE
+    AMBILIGHT_STYLE = PhilipsAPI.AMBILIGHT_STYLE
+    AMBILIGHT_MENU_OFF = PhilipsAPI.AMBILIGHT_MENU_OFF
+    AMBILIGHT_MENU_FOLLOW_VIDEO = PhilipsAPI.AMBILIGHT_MENU_FOLLOW_VIDEO
+    AMBILIGHT_MENU_FOLLOW_AUDIO = PhilipsAPI.AMBILIGHT_MENU_FOLLOW_AUDIO
+    AMBILIGHT_MENU_LOUNGE_LIGHT = PhilipsAPI.AMBILIGHT_MENU_LOUNGE_LIGHT
+    AMBILIGHT_MENU_FOLLOW_FLAG = PhilipsAPI.AMBILIGHT_MENU_FOLLOW_FLAG
+    AMBILIGHT_MENU_FOLLOW_APP = PhilipsAPI.AMBILIGHT_MENU_FOLLOW_APP
+    AMBILIGHT_OFF = PhilipsAPI.AMBILIGHT_OFF
+    AMBILIGHT_LIGHTNESS = PhilipsAPI.AMBILIGHT_LIGHTNESS
+    AMBILIGHT_SATURATION = PhilipsAPI.AMBILIGHT_SATURATION
+
+    def __init__(self, host=None, user=None, passwd=None, mac=None, timeout=0.5, waketime=0.5, repeats=3,
+                 wake_timeout=20.0, max_connections=4, rtt=None, digest=None):
+        self._host = host
+        self._user = user
+        self._passwd = passwd
+        self._timeout = timeout
+        self._waketime = waketime
+        self._repeats = repeats
+        self._wake_timeout = wake_timeout
+        self._max_connections = max_connections
+
+        self.mac = mac
+        """MAC address of the TV. Used for Wake on LAN."""
+
+        self.rtt = rtt if rtt is not None else RttEstimator(initial=timeout)
+        """Round-trip time estimator."""
+
+        self.digest = digest if digest is not None else DigestStore()
+        """Digest authentication state."""
+
+        self._idle = []
+        self._slots = None
+        self._loop = None
+
+        self._ssl = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+
+    def _reset(self):
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+    def _bind(self):
+        # Connections and the semaphore belong to the event loop they were created in, so start afresh when
+        # the object is used from another loop (e.g. after another asyncio.run)
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except RuntimeError:  # loop already closed
+                pass
+        self._slots = asyncio.Semaphore(self._max_connections)
+        self._loop = loop
+
+    @property
+    def host(self):
+        """Hostname or IP of the TV."""
+        return self._host
+
+    @host.setter
+    def host(self, host):
+        self._host = host
+        self._reset()
+
+    @property
+    def user(self):
+        """HTTP user name."""
+        return self._user
+
+    @user.setter
+    def user(self, user):
+        self._user = user
+
+    @property
+    def passwd(self):
+        """HTTP password."""
+        return self._passwd
+
+    @passwd.setter
+    def passwd(self, passwd):
+        self._passwd = passwd
+
+    async def close(self):
+        """Close all open connections to the TV."""
+        idle, self._idle = self._idle, []
+        self._slots = self._loop = None
+        for conn in idle:
+            conn.close()
+        for conn in idle:
+            try:
+                await conn.writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+    async def _send_magic_packet(self):
+        # Socket setup and name resolution may block, so the packet is sent from the default executor
+        await asyncio.get_running_loop().run_in_executor(None, send_magic_packet, self.mac)
+
+    async def wakeup(self, waketime=None):
+        """Turn on the TV using Wake on LAN.
+
+        Args:
+            waketime (float, optional): Time to wait after waking the TV. If None, class defaults are used.
+        """
+        if waketime is None: waketime = self._waketime
+        if self.mac:
+            await self._send_magic_packet()
+            await asyncio.sleep(waketime)
+
+    async def wake_and_wait(self, timeout=None, interval=0.5):
+        """Turn on the TV using Wake on LAN and wait until it is ready.
+
+        Magic packets are re-sent with growing intervals, while the TV system info is requested concurrently.
+        The function returns as soon as the TV answers.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds. If None, class defaults are used.
+            interval (float, optional): Initial interval between magic packets. Defaults to 0.5.
+
+        Returns:
+            bool: True if the TV is ready, False if it did not answer in time.
+        """
+        if not self._host: raise NoHost()
+        if timeout is None: timeout = self._wake_timeout
+
+        async def wake(interval):
+            while True:
+                await self._send_magic_packet()
+                await asyncio.sleep(interval)
+                interval = min(2 * interval, 4.0)
+
+        async def probe():
+            while True:
+                try:
+                    resp = await asyncio.wait_for(self._exchange('GET', '/6/system', {}, b''), 1.0)
+                except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+                    await asyncio.sleep(0.05)
+                else:
+                    if resp.status_code == 200:
+                        return
+
+        waker = asyncio.ensure_future(wake(interval)) if self.mac else None
+        try:
+            await asyncio.wait_for(probe(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waker is not None:
+                waker.cancel()
+        return True
+
+    async def _connect(self):
+        self._bind()
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.closed:
+                return conn
+            conn.close()
+        reader, writer = await asyncio.open_connection(self._host, 1926, ssl=self._ssl)
+        return _Connection(reader, writer)
+
+    def _release(self, conn):
+        if conn.closed:
+            conn.close()
+        else:
+            self._idle.append(conn)
+
+    async def _exchange(self, method, target, headers, body):
+        host = self._host
+        while True:
+            start = monotonic()
+            conn = await self._connect()
+            reused = conn.used
+            try:
+                resp = await conn.request(method, host, target, headers, body)
+                resp.elapsed = timedelta(seconds=monotonic() - start)
+            except (OSError, asyncio.IncompleteReadError):
+                conn.close()
+                if reused:
+                    continue  # stale keep-alive connection; try a fresh one
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if host == self._host:
+                self._release(conn)
+            else:
+                conn.close()
+            return resp
+
+    async def _request(self, method, target, body, timeout, auth):
+        headers = {'Accept': 'application/json'}
+        if body:
+            headers['Content-Type'] = 'application/json'
+        if auth is None:
+            credentials = (self._user, self._passwd) if self._user is not None else None
+        elif not auth:
+            credentials = None
+        else:
+            credentials = (auth.user, auth.passwd) if hasattr(auth, 'passwd') else \
+                (auth.username, auth.password) if hasattr(auth, 'username') else tuple(auth)
+        host = self._host
+        self._bind()
+        async with self._slots:
+            if credentials is not None:
+                header = self.digest.authorization(host, *credentials, method, target)
+                if header is not None:
+                    headers['Authorization'] = header
+            resp = await asyncio.wait_for(self._exchange(method, target, headers, body), timeout)
+            if resp.status_code == 401 and credentials is not None and \
+                    self.digest.update(host, *credentials, resp.headers.get('www-authenticate')):
+                headers['Authorization'] = self.digest.authorization(host, *credentials, method, target)
+                resp = await asyncio.wait_for(self._exchange(method, target, headers, body), timeout)
+            return resp
+
+    async def _process(self, method, path, timeout, auth, body=None):
+        host = self._host
+        if not host: raise NoHost()
+        cls = endpoint_class(path)
+        if timeout is None: timeout = self.rtt.timeout(host, cls)
+        if not isinstance(body, bytes):
+            body = b'' if body is None else json.dumps(body).encode('utf-8')
+        repeats = self.rtt.attempts(host, cls, self._repeats)
+        last = repeats - 1
+        for i in range(repeats):
+            try:
+                resp = await self._request(method, f"/6/{path}", body, timeout, auth)
+            except asyncio.TimeoutError as err:
+                if i == last or self.mac and not await self.wake_and_wait():
+                    raise NotRechable() from err
+                timeout *= 2
+                continue
+            except (OSError, asyncio.IncompleteReadError) as err:
+                raise NotRechable() from err
+            else:
+                if i == 0:
+                    self.rtt.sample(host, cls, resp.elapsed.total_seconds())
+                if resp.status_code == 200:
+                    try:
+                        return resp.json()
+                    except ValueError:
+                        return resp.text
+                elif resp.status_code == 401:
+                    raise NotAuthorized()
+                raise ApiError(response=resp)
+
+    async def get(self, path, timeout=None, auth=None):
+        """Generic GET request.
+
+        Args:
+            path (str): API path.
+            timeout (float, optional): Timeout. If missing, class defauls is used.
+            auth (optional): Digest credentials as DigestAuth, HTTPDigestAuth or (user, passwd) tuple.
+                             If False, the request is not authorized.
+
+        Returns:
+            Response JSON.
+        """
+        return await self._process('GET', path, timeout, auth)
+
+    async def post(self, path, body, timeout=None, auth=None):
+        """Generic POST request.
+
+        Args:
+            path (str): API path.
+            body: Request JSON. It can also be bytes with already encoded JSON.
+            timeout (float, optional): Timeout. If missing, class defauls is used.
+            auth (optional): Digest credentials as DigestAuth, HTTPDigestAuth or (user, passwd) tuple.
+                             If False, the request is not authorized.
+
+        Returns:
+            Response JSON.
+        """
+        return await self._process('POST', path, timeout, auth, body)
+
+    async def pair_request(self):
+        """Initiate pairing process.
+
+        Returns:
+            dict: Data required by pair_grant method.
+        """
+        user = ''.join(
+            random.SystemRandom().choice(string.ascii_uppercase + string.digits + string.ascii_lowercase) for _ in range(16)
+        )
+        device = {
+            'device_name': 'Kivy',
+            'device_os': 'Android',
+            'app_id': 'com.macdems.philipstv',
+            'app_name': 'PhilipsTV Kivy Remote',
+            'type': 'native',
+            'id': user
+        }
+        request_data = {'scope': ['read', 'write', 'control'], 'device': device}
+        resp = await self.post('pair/request', request_data, auth=False, timeout=self._timeout*2)
+        if resp is None or resp['error_id'] != 'SUCCESS':
+            raise ApiError(response=resp)
+        return {'device': device, 'user': user, 'passwd': resp['auth_key'], 'auth_timestamp': resp['timestamp']}
+
+    async def pair_grant(self, pin, device, user, passwd, auth_timestamp):
+        """Confirm pairing.
+
+        Args:
+            pin (str): PIN number as displayed by the TV.
+            device, user, passwd, auth_timestamp: Data returned by pair_request
+        """
+        pin = str(pin)
+        auth = {
+            'auth_AppId': '1',
+            'pin': pin,
+            'auth_timestamp': auth_timestamp,
+            'auth_signature': 'authsignature'
+        }
+        grant_data = {'auth': auth, 'device': device}
+        resp = await self.post('pair/grant', grant_data, auth=(user, passwd))
+        if resp is None or resp['error_id'] != 'SUCCESS':
+            raise ApiError(response=resp)
+        self._user = user
+        self._passwd = passwd
+
+    async def pair(self, callback=lambda: input("Enter PIN: ")):
+        """Pair the TV.
+
+        This function is a shorthand for calling pair_request and pair_grant.
+        The callback function should be user input that returns PIN displayed by the TV. It may be a coroutine function.
+
+        Args:
+            callback (function, optional): Function that should return pin number displayed on the TV.
+        """
+        data = await self.pair_request()
+        pin = callback()
+        if asyncio.iscoroutine(pin):
+            pin = await pin
+        await self.pair_grant(pin=pin, **data)
+
+    async def send_key(self, key):
+        """Send TV remote key.
+
+        Args:
+            key (str): Key name. See :meth:`PhilipsAPI.send_key` for the list of keys.
+        """
+        await self.post('input/key', {'key': key})
+
+    async def get_settings(self, *nodes):
+        """Get current value of given settings nodes.
+
+        Returns:
+            dict: Dict with node numbers and setting values.
+        """
+        data = await self.post('menuitems/settings/current', {'nodes': [{'nodeid': node} for node in nodes]})
+        if not data: return {}
+        return {val['value']['Nodeid']: val['value'] for val in data.get('values', [])}
+
+    async def update_setting(self, node, data):
+        """Update given settings node.
+
+        Args:
+            node (int): Settings node number.
+            data: Settings value.
+        """
+        await self.update_settings({node: data})
+
+    async def update_settings(self, settings):
+        """Update several settings nodes in a single request.
+
+        Args:
+            settings (dict): Dict with node numbers and settings values.
+
+        Returns:
+            dict: Dict with node numbers and update results reported by the TV.
+        """
+        resp = await self.post(
+            'menuitems/settings/update', {'values': [{'value': {'Nodeid': node, 'data': data}} for node, data in settings.items()]}
+        )
+        return _settings_results(settings, resp)
+
+    async def get_system(self):
+        """Get system info from your TV.
+
+        Returns:
+            dict: Dictionary with system info.
+        """
+        return await self.get('system')
+
+    async def get_applications(self):
+        """Get info on installed applications.
+
+        Returns:
+            list: List of application details.
+        """
+        res = await self.get('applications')
+        if res is None:
+            return []
+        return res.get('applications', [])
+
+    async def launch_application(self, package_name, class_name, action='empty'):
+        """Launch specified application.
+
+        Args:
+            package_name (str): Android package name.
+            class_name (str): Android class name.
+            action (str, optional): Android action descriptor. Defaults to 'empty'.
+        """
+        if action == 'empty':
+            action = ''
+        else:
+            action = ' act=' + action
+        intent = {
+            'action': f"Intent {{ {action} cmp={package_name}/{class_name} flg=0x20000000 }}",
+            'component': {
+                "packageName": package_name,
+                "className": class_name,
+            }
+        }
+        await self.post('activities/launch', {'intent': intent})
+
+    async def get_current_network_device(self):
+        """Get information on the TV network device, this class is attached to.
+
+        Returns:
+            str: Current network device details.
+        """
+        devices = await self.get('network/devices')
+        info = await asyncio.get_running_loop().getaddrinfo(self._host, None, family=socket.AF_INET)
+        hostip = info[0][4][0]
+        devices = [dev for dev in devices if dev.get('ip') == hostip]
+        if len(devices) > 0: return devices[0]
+
+    async def set_mac(self):
+        """Automatically set MAC address of the TV.
+
+        Returns:
+            str: Detected MAC address.
+        """
+        device = await self.get_current_network_device()
+        if device and device['mac']:
+            self.mac = device['mac']
+            return self.mac
+
+    async def get_strings(self, *ids, country='en_US', lang=None):
+        """Get translation strings from the TV.
+
+        Args:
+            ids (list[str]): String IDs.
+            country (str, optional): Country code. Defaults to 'en_US'.
+            lang (str, optional): Language code. By default determined from country code.
+
+        Returns:
+            dict: Dict with string IDs and retrieved translations.
+        """
+        if lang is None:
+            try:
+                lang = country.split('_')[1]
+            except:
+                lang = 'en'
+        data = {'locale': {'country': country, 'language': lang}, 'strings': [{'string_id': s} for s in ids]}
+        return {res['string_id']: res['string_translation'] for res in (await self.post('strings', data))['translations']}
+
+    async def get_ambilight_topology(self):
+        """Get ambilight topology.
+
+        The returned dictionary contains the following keys:
+            layers: string with ambilight layers; usually just '1'
+            left, right, top, bottom: number of ambilight zones at each side
+
+        Returns:
+            dict: Dictionary with ambilight topology.
+        """
+        return await self.get('ambilight/topology')
+
+    async def set_ambilight_expert(self, layers, **sides):
+        """Set expert ambilight colors.
+
+        Args:
+            layers (str): String with ambilight layers to set.
+            sides: Ambilight expert settings for each side.
+        """
+        data = {}
+        for l in str(layers):
+            data[f"layer{l}"] = layer = {}
+            for side, vals in sides.items():
+                if vals: layer[side] = vals
+        await self.post('ambilight/cached', data)
+        await self.post('ambilight/mode', {'current': 'expert'})
@@ -0,0 +1,302 @@
+"""Ambilight frames backed by NumPy arrays.
+
+This module requires NumPy, which is not needed by the rest of the package.
+"""
+import threading
+
+from time import monotonic, sleep
+
+import numpy as np
+
+from .rtt import smooth
+
+SIDES = 'left', 'top', 'right', 'bottom'
+
+
+class AmbilightFrame:
+    """Colors of all ambilight zones.
+
+    Colors are kept in :attr:`data` array of shape (layers, sides, zones, 3) and type uint8, where sides are
+    ordered as in :data:`SIDES` and the zones dimension is the largest number of zones at any side. Zones
+    beyond the number of zones of a side are ignored.
+
+    The JSON payload for ``ambilight/cached`` is produced with a format template prepared once for
+    the topology, so encoding a frame needs no intermediate dictionaries.
+
+    Args:
+        topology (dict): Ambilight topology as returned by :meth:`PhilipsAPI.get_ambilight_topology`.
+        data (array, optional): Initial colors. Defaults to black.
+    """
+
+    def __init__(self, topology, data=None):
+        self.topology = topology
+        self.layers = tuple(str(topology['layers']))
+        self.counts = tuple(int(topology.get(side, 0)) for side in SIDES)
+        self.shape = len(self.layers), len(SIDES), max(self.counts + (1,)), 3
+        if data is None:
+            self.data = np.zeros(self.shape, np.uint8)
+        else:
+            self.data = np.array(data, np.uint8).reshape(self.shape)
+        self.mask = np.zeros(self.shape[:3], bool)
+        for s, count in enumerate(self.counts):
+            self.mask[:, s, :count] = True
+        self._template = self._build_template()
+
+    @classmethod
+    def from_api(cls, api):
+        """Create black frame for the TV topology.
+
+        Args:
+            api (PhilipsAPI): TV API.
+        """
+        return cls(api.get_ambilight_topology())
+
+    def _build_template(self):
+        layers = []
+        for layer in self.layers:
+            sides = []
+            for s, side in enumerate(SIDES):
+                zones = ','.join(f'"{n}":{{"r":%d,"g":%d,"b":%d}}' for n in range(self.counts[s]))
+                if zones:
+                    sides.append(f'"{side}":{{{zones}}}')
+            layers.append(f'"layer{layer}":{{{",".join(sides)}}}')
+        return '{' + ','.join(layers) + '}'
+
+    def copy(self):
+        """Create copy of the frame."""
+        return AmbilightFrame(self.topology, self.data)
+
+    def side(self, name, layer=0):
+        """Get writable view of the colors at one side.
+
+        Args:
+            name (str): Side name.
+            layer (int, optional): Layer index. Defaults to 0.
+
+        Returns:
+            array: Array of shape (zones, 3).
+        """
+        s = SIDES.index(name)
+        return self.data[layer, s, :self.counts[s]]
+
+    def fill(self, r, g, b):
+        """Set all zones to the same color."""
+        self.data[...] = r, g, b
+
+    def values(self, mask=None):
+        """Get colors of the existing zones as a flat array.
+
+        Args:
+            mask (array, optional): Boolean array of shape (layers, sides, zones) selecting zones.
+
+        Returns:
+            array: Array of shape (zones, 3).
+        """
+        return self.data[self.mask if mask is None else mask & self.mask]
+
+    def payload(self, mask=None):
+        """Encode frame as the ``ambilight/cached`` request body.
+
+        Args:
+            mask (array, optional): Boolean array of shape (layers, sides, zones). If given, only the selected
+                                    zones are included, which is slower than encoding the full frame.
+
+        Returns:
+            bytes: JSON payload.
+        """
+        if mask is None:
+            return (self._template % tuple(self.data[self.mask].ravel().tolist())).encode('ascii')
+        index = np.nonzero(mask & self.mask)
+        layers, sides, zones = {}, None, None
+        for l, s, n, (r, g, b) in zip(*(i.tolist() for i in index), self.data[index].tolist()):
+            if l not in layers:
+                sides = layers[l] = {}
+            if s not in sides:
+                zones = sides[s] = []
+            zones.append('"%d":{"r":%d,"g":%d,"b":%d}' % (n, r, g, b))
+        return ('{' + ','.join(
+            f'"layer{self.layers[l]}":{{' + ','.join(f'"{SIDES[s]}":{{' + ','.join(zones) + '}'
+                                                     for s, zones in sides.items()) + '}'
+            for l, sides in layers.items()
+        ) + '}').encode('ascii')
+
+    def to_dict(self):
+        """Convert frame to keyword arguments of :meth:`PhilipsAPI.set_ambilight_expert`.
+
+        Only the first layer is used, as the same colors are set for all layers by that method.
+        """
+        return {side: {str(n): dict(zip('rgb', self.data[0, s, n].tolist())) for n in range(self.counts[s])}
+                for s, side in enumerate(SIDES) if self.counts[s]}
+
+    def send(self, api, mask=None):
+        """Send frame to ``ambilight/cached``.
+
+        Expert ambilight mode must be set separately for the colors to be shown.
+
+        Args:
+            api (PhilipsAPI): TV API.
+            mask (array, optional): Zones to send, as in :meth:`payload`.
+        """
+        api.post('ambilight/cached', self.payload(mask))
+
+
+class AmbilightStream:
+    """Real-time ambilight streaming session.
+
+    Expert ambilight mode is set once, when the session starts, and then frames are sent to ``ambilight/cached``
+    from a background thread over the API keep-alive connection. Only the latest pushed frame is sent: frames
+    pushed while the previous one is still being sent replace each other and are counted as dropped. Only
+    the zones changed since the last sent frame are included, except for a periodic full frame.
+
+    The frame rate is limited by ``rate`` and by the measured acknowledgement latency of the TV, so frames are
+    never queued behind slow responses. Every frame is sent once, without retries or waking the TV up; if it
+    fails, the next pushed frame is sent instead, as a full frame.
+
+    Args:
+        api (PhilipsAPI): TV API.
+        rate (float, optional): Maximum frame rate. Defaults to 25.
+        delta (bool, optional): Send only changed zones. Defaults to True.
+        full_interval (float, optional): Interval between full frames in seconds. Defaults to 1.0.
+        restore (bool, optional): Restore previous ambilight mode when the session stops. Defaults to True.
+        on_error (callable, optional): Function called with the exception when sending a frame fails.
+    """
+
+    def __init__(self, api, rate=25.0, delta=True, full_interval=1.0, restore=True, on_error=None):
+        self.api = api
+        self.max_rate = rate
+        self.delta = delta
+        self.full_interval = full_interval
+        self.restore = restore
+        self.on_error = on_error
+        self.frame = None
+        """Frame, which can be modified and then sent with :meth:`push`."""
+        self.sent = 0
+        """Number of sent frames."""
+        self.dropped = 0
+        """Number of pushed frames replaced by newer ones before sending."""
+        self.bytes = 0
+        """Total size of sent payloads."""
+        self.latency = None
+        """Smoothed acknowledgement latency and its variance."""
+        self._pending = None
+        self._last = None
+        self._fresh = False
+        self._mode = None
+        self._thread = None
+        self._running = False
+        self._cond = threading.Condition()
+
+    @property
+    def rate(self):
+        """Current frame rate limit."""
+        if self.latency is None:
+            return self.max_rate
+        return min(self.max_rate, 1. / max(self.latency[0], 1e-6))
+
+    def start(self, topology=None):
+        """Start streaming.
+
+        Args:
+            topology (dict, optional): Ambilight topology. If not given, it is read from the TV.
+        """
+        if self._thread is not None:
+            return
+        if topology is None:
+            topology = self.api.get_ambilight_topology()
+        self.frame = AmbilightFrame(topology)
+        self._pending = np.zeros(self.frame.shape, np.uint8)
+        self._last = None
+        self._fresh = False
+        if self.restore:
+            try:
+                self._mode = self.api.get('ambilight/mode')
+            except Exception:
+                self._mode = None
+        self.api.post('ambilight/mode', {'current': 'expert'})
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='philipstv-ambilight', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop streaming, waiting for the frame being sent."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+        if self._mode is not None:
+            try:
+                self.api.post('ambilight/mode', self._mode)
+            except Exception:
+                pass
+            self._mode = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def push(self, frame=None):
+        """Schedule frame for sending.
+
+        Args:
+            frame (AmbilightFrame or array, optional): Frame to send. Defaults to :attr:`frame`.
+        """
+        if frame is None:
+            frame = self.frame
+        data = frame.data if isinstance(frame, AmbilightFrame) else frame
+        with self._cond:
+            np.copyto(self._pending, data, casting='unsafe')
+            if self._fresh:
+                self.dropped += 1
+            self._fresh = True
+            self._cond.notify()
+
+    def _run(self):
+        frame = AmbilightFrame(self.frame.topology)
+        next_time = last_full = monotonic()
+        while True:
+            with self._cond:
+                while self._running and not self._fresh:
+                    self._cond.wait()
+                if not self._running:
+                    return
+            delay = next_time - monotonic()
+            if delay > 0:
+                sleep(delay)
+            with self._cond:
+                if not self._running:
+                    return
+                np.copyto(frame.data, self._pending)
+                self._fresh = False
+            start = monotonic()
+            mask = None
+            if self.delta and self._last is not None and start - last_full < self.full_interval:
+                mask = (frame.data != self._last).any(axis=-1) & frame.mask
+                if not mask.any():
+                    continue
+            else:
+                last_full = start
+            payload = frame.payload(mask)
+            try:
+                # A frame is sent once: if it fails, the next pushed frame replaces it
+                self.api.post('ambilight/cached', payload, retry=False)
+            except Exception as err:
+                self._last = None
+                if self.on_error is not None:
+                    self.on_error(err)
+                next_time = monotonic() + 1. / self.rate
+                continue
+            end = monotonic()
+            self.latency = smooth(self.latency, end - start)
+            if self._last is None:
+                self._last = frame.data.copy()
+            else:
+                np.copyto(self._last, frame.data)
+            self.sent += 1
+            self.bytes += len(payload)
+            next_time = start + 1. / self.rate
@@ -0,0 +1,88 @@
+import copy
+import threading
+
+
+class _Batch:
+
+    def __init__(self):
+        self.keys = {}
+        self.result = None
+        self.error = None
+        self.done = False
+
+
+class _Group:
+
+    def __init__(self):
+        self.busy = False
+        self.next = None
+
+
+class RequestBatcher:
+    """Merge concurrent requests for sets of keys into single requests.
+
+    Requests are grouped by an arbitrary hashable group (e.g. locale). If there is no request for the group in
+    flight, a call is sent immediately. Otherwise it waits and all calls that arrive in the meantime are merged
+    into one request, sent as soon as the previous one completes. Hence an idle batcher adds no latency, while
+    a busy one sends at most one request per group at a time.
+
+    If the request fails, the caller that sent it gets the exception, while every other caller in the batch
+    gets a copy of it, with the original as its cause.
+
+    Args:
+        fetch (function): Function called as ``fetch(group, keys)`` that returns a dict with values for the keys.
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._cond = threading.Condition()
+        self._groups = {}
+
+    def get(self, group, keys):
+        """Get values for given keys.
+
+        Args:
+            group: Request group.
+            keys (iterable): Requested keys.
+
+        Returns:
+            dict: Dict with requested keys and values returned by fetch function.
+        """
+        keys = list(keys)
+        with self._cond:
+            state = self._groups.get(group)
+            if state is None:
+                state = self._groups[group] = _Group()
+            batch = state.next
+            if batch is None:
+                batch = state.next = _Batch()
+            batch.keys.update(dict.fromkeys(keys))
+            while not batch.done and (state.busy or batch is not state.next):
+                self._cond.wait()
+            sender = not batch.done
+            if sender:
+                state.busy = True
+                state.next = None
+
+        if sender:
+            try:
+                batch.result = self._fetch(group, list(batch.keys))
+            except Exception as err:
+                batch.error = err
+            with self._cond:
+                batch.done = True
+                state.busy = False
+                if state.next is None and self._groups.get(group) is state:
+                    del self._groups[group]
+                self._cond.notify_all()
+
+        if batch.error is not None:
+            if sender:
+                raise batch.error
+            # Every waiter raises its own exception, so they do not modify the traceback of the shared one
+            try:
+                error = copy.copy(batch.error)
+            except Exception:
+                error = RuntimeError(str(batch.error))
+            raise error from batch.error
+        return {key: batch.result[key] for key in keys if key in batch.result}
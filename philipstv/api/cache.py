@@ -0,0 +1,194 @@
+import os
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+FIRMWARE_KEYS = 'model', 'model_encrypted', 'softwareversion', 'softwareversion_encrypted', 'nettvversion', 'api_version'
+
+
+def firmware_id(system):
+    """Compute firmware identifier from the TV system info.
+
+    Args:
+        system (dict): System info returned by :meth:`PhilipsAPI.get_system`.
+
+    Returns:
+        str: String identifying TV model and firmware.
+    """
+    return '|'.join(str(system.get(key, '')) for key in FIRMWARE_KEYS)
+
+
+class StringsCache:
+    """Persistent cache of TV translation strings.
+
+    Translations are stored per TV firmware and locale. Entries of the firmware that is no longer used by any
+    known TV are dropped when the firmware changes. The number of stored strings is bounded and the least
+    recently used ones are evicted first.
+
+    The file is rewritten after every change, always to a temporary file that then atomically replaces it, so
+    it is never left half-written. Use :meth:`batch` to write it once after several changes.
+
+    Args:
+        path (str, optional): JSON file to store the cache in. If None, the cache is kept in memory only.
+        max_entries (int, optional): Maximum number of stored strings. Defaults to 5000.
+    """
+
+    def __init__(self, path=None, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._firmware = {}
+        self._lock = threading.RLock()
+        self._batches = 0
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Load cache contents from the file."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            with self._lock:
+                self._firmware = dict(data.get('firmware', {}))
+                self._entries = OrderedDict(
+                    ((fw, country, lang, string_id), text) for fw, country, lang, string_id, text in data.get('strings', [])
+                )
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def save(self):
+        """Write cache contents to the file."""
+        if self.path is None:
+            return
+        with self._lock:
+            if self._batches:
+                self._dirty = True
+                return
+            self._dirty = False
+            data = {'firmware': self._firmware, 'strings': [list(key) + [text] for key, text in self._entries.items()]}
+            folder, name = os.path.split(os.path.abspath(self.path))
+            try:
+                fd, tmp = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=folder)
+            except OSError:
+                return
+            try:
+                with open(fd, 'w', encoding='utf-8') as file:
+                    json.dump(data, file, ensure_ascii=False)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp, self.path)
+            except OSError:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def batch(self):
+        """Defer writing the file until the end of the block.
+
+        Changes made in the meantime, also from other threads, are written once when the outermost block exits.
+        """
+        with self._lock:
+            self._batches += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batches -= 1
+                flush = not self._batches and self._dirty
+            if flush:
+                self.save()
+
+    def firmware(self, host):
+        """Get last known firmware identifier of the TV.
+
+        Args:
+            host (str): TV host.
+
+        Returns:
+            str: Firmware identifier or None if unknown.
+        """
+        return self._firmware.get(host)
+
+    def set_firmware(self, host, firmware):
+        """Set firmware identifier of the TV.
+
+        If it has changed, strings of the previous firmware are dropped unless another TV uses it.
+
+        Args:
+            host (str): TV host.
+            firmware (str): Firmware identifier.
+        """
+        with self._lock:
+            old = self._firmware.get(host)
+            if old == firmware:
+                return
+            self._firmware[host] = firmware
+            if old is not None and old not in self._firmware.values():
+                for key in [key for key in self._entries if key[0] == old]:
+                    del self._entries[key]
+        self.save()
+
+    def get(self, firmware, country, lang, ids):
+        """Get cached translations.
+
+        Args:
+            firmware (str): Firmware identifier.
+            country (str): Country code.
+            lang (str): Language code.
+            ids (iterable): String IDs.
+
+        Returns:
+            tuple: Dict with found translations and list of missing string IDs.
+        """
+        found, missing = {}, []
+        with self._lock:
+            for string_id in ids:
+                key = firmware, country, lang, string_id
+                try:
+                    found[string_id] = self._entries[key]
+                except KeyError:
+                    missing.append(string_id)
+                else:
+                    self._entries.move_to_end(key)
+        return found, missing
+
+    def put(self, firmware, country, lang, translations):
+        """Store translations.
+
+        Args:
+            firmware (str): Firmware identifier.
+            country (str): Country code.
+            lang (str): Language code.
+            translations (dict): Dict with string IDs and translations.
+        """
+        if not translations:
+            return
+        with self._lock:
+            for string_id, text in translations.items():
+                key = firmware, country, lang, string_id
+                self._entries[key] = text
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.save()
+
+    def known_ids(self, firmware):
+        """Get all string IDs cached for the firmware in any locale.
+
+        Args:
+            firmware (str): Firmware identifier.
+
+        Returns:
+            list: String IDs.
+        """
+        with self._lock:
+            return list(dict.fromkeys(key[3] for key in self._entries if key[0] == firmware))
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SettingsChannel:
+    """Latest-value-wins updates of TV settings nodes.
+
+    This is intended for settings bound to continuous controls, like sliders. Each call to :meth:`update`
+    replaces the value waiting for the node, so intermediate values are dropped while the previous request is
+    in flight. At most one request per node is sent at a time and the last value is always delivered.
+
+    Args:
+        api (PhilipsAPI): API object used to update settings.
+        on_error (function, optional): Function called with the exception if an update fails.
+                                       It is called from a background thread.
+        max_workers (int, optional): Maximum number of nodes updated simultaneously. Defaults to 2.
+    """
+
+    def __init__(self, api, on_error=None, max_workers=2):
+        self.api = api
+        self.on_error = on_error
+        self._max_workers = max_workers
+        self._pending = {}
+        self._busy = set()
+        self._cond = threading.Condition()
+        self._pool = None
+
+    def update(self, node, data):
+        """Schedule update of the settings node.
+
+        Args:
+            node (int): Settings node number.
+            data: Settings value.
+        """
+        with self._cond:
+            self._pending[node] = data
+            if node in self._busy:
+                return
+            self._busy.add(node)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self._max_workers, thread_name_prefix='philipstv-settings')
+        self._pool.submit(self._drain, node)
+
+    def flush(self, timeout=None):
+        """Wait until all scheduled updates are sent.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            bool: False if the timeout expired.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy, timeout)
+
+    def _drain(self, node):
+        while True:
+            with self._cond:
+                try:
+                    data = self._pending.pop(node)
+                except KeyError:
+                    self._busy.discard(node)
+                    self._cond.notify_all()
+                    return
+            try:
+                self.api.update_setting(node, data)
+            except Exception as err:
+                if self.on_error is not None:
+                    self.on_error(err)
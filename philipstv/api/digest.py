@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+
+_HASHES = {
+    'MD5': hashlib.md5,
+    'MD5-SESS': hashlib.md5,
+    'SHA': hashlib.sha1,
+    'SHA-SESS': hashlib.sha1,
+    'SHA-256': hashlib.sha256,
+    'SHA-256-SESS': hashlib.sha256,
+    'SHA-512': hashlib.sha512,
+    'SHA-512-SESS': hashlib.sha512,
+}
+
+_PARAM_RE = re.compile(r'(\w+)\s*=\s*("(?:[^"\\]|\\.)*"|[^\s,]+)')
+
+
+def parse_challenge(header):
+    """Parse WWW-Authenticate header with Digest challenge.
+
+    Args:
+        header (str): Header value.
+
+    Returns:
+        dict: Challenge parameters or None if the header does not contain Digest challenge.
+    """
+    if not header or not header.lstrip().lower().startswith('digest'):
+        return None
+    params = {}
+    for key, value in _PARAM_RE.findall(header.lstrip()[6:]):
+        if value.startswith('"'):
+            value = value[1:-1].replace('\\"', '"')
+        params[key.lower()] = value
+    if 'nonce' not in params:
+        return None
+    return params
+
+
+class DigestChallenge:
+    """Digest authentication state for a single server.
+
+    It keeps last nonce received from the server and the nonce count, so subsequent requests can be authorized
+    without additional challenge round trip. The credentials hash is computed once.
+
+    Args:
+        user (str): User name.
+        passwd (str): User password.
+        challenge (dict): Challenge parameters as returned by :func:`parse_challenge`.
+        nc (int, optional): Number of requests already authorized with the challenge nonce. Defaults to 0.
+    """
+
+    def __init__(self, user, passwd, challenge, nc=0):
+        self.user = user
+        self.passwd = passwd
+        self.realm = challenge.get('realm', '')
+        self.nonce = challenge['nonce']
+        self.opaque = challenge.get('opaque')
+        self.algorithm = challenge.get('algorithm', 'MD5').upper()
+        qop = [q.strip() for q in (challenge.get('qop') or '').split(',')]
+        self.qop = 'auth' if 'auth' in qop else None
+        self.nc = nc
+        try:
+            self._hash = _HASHES[self.algorithm]
+        except KeyError:
+            raise ValueError(f"Unsupported digest algorithm: {self.algorithm}")
+        self._ha1 = self._h(f"{user}:{self.realm}:{passwd}")
+
+    @property
+    def params(self):
+        """Challenge parameters, which can be used to recreate this object."""
+        return {'realm': self.realm, 'nonce': self.nonce, 'opaque': self.opaque, 'algorithm': self.algorithm,
+                'qop': self.qop}
+
+    def _h(self, data):
+        return self._hash(data.encode('utf-8')).hexdigest()
+
+    def authorization(self, method, uri):
+        """Build Authorization header value for the next request.
+
+        Args:
+            method (str): HTTP method.
+            uri (str): Request URI (path with query).
+
+        Returns:
+            str: Authorization header value.
+        """
+        self.nc += 1
+        ncvalue = f"{self.nc:08x}"
+        cnonce = os.urandom(8).hex()
+        ha1 = self._ha1
+        if self.algorithm.endswith('-SESS'):
+            ha1 = self._h(f"{ha1}:{self.nonce}:{cnonce}")
+        ha2 = self._h(f"{method}:{uri}")
+        if self.qop:
+            response = self._h(f"{ha1}:{self.nonce}:{ncvalue}:{cnonce}:{self.qop}:{ha2}")
+        else:
+            response = self._h(f"{ha1}:{self.nonce}:{ha2}")
+        header = (
+            f'Digest username="{self.user}", realm="{self.realm}", nonce="{self.nonce}", uri="{uri}", '
+            f'response="{response}", algorithm="{self.algorithm}"'
+        )
+        if self.opaque:
+            header += f', opaque="{self.opaque}"'
+        if self.qop:
+            header += f', qop="{self.qop}", nc={ncvalue}, cnonce="{cnonce}"'
+        return header
+
+
+class DigestStore:
+    """Digest authentication state of many TV hosts.
+
+    For every host, the last challenge received from it and the nonce count are kept, regardless of credentials
+    changes, so all requests can be authorized preemptively. If the nonce gets stale, the server responds with
+    a new challenge and the state is updated. The state can be stored in a file to be reused after restart.
+
+    Args:
+        path (str, optional): JSON file to store the state in. If None, the state is kept in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._params = {}
+        self._challenges = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the state from the file."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            with self._lock:
+                self._params = {host: (dict(params), int(nc)) for host, (params, nc) in data.items()}
+                self._challenges = {}
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def save(self):
+        """Write the state to the file."""
+        if self.path is None:
+            return
+        with self._lock:
+            data = {}
+            for host, (params, nc) in self._params.items():
+                challenge = self._challenges.get(host)
+                if challenge is not None:
+                    params, nc = challenge.params, challenge.nc
+                data[host] = params, nc
+            folder, name = os.path.split(os.path.abspath(self.path))
+            try:
+                fd, tmp = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=folder)
+            except OSError:
+                return
+            try:
+                with open(fd, 'w', encoding='utf-8') as file:
+                    json.dump(data, file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp, self.path)
+            except OSError:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    def authorization(self, host, user, passwd, method, uri):
+        """Build Authorization header for the request, if the host challenge is known.
+
+        Args:
+            host (str): TV host.
+            user (str): User name.
+            passwd (str): User password.
+            method (str): HTTP method.
+            uri (str): Request URI (path with query).
+
+        Returns:
+            str: Authorization header value or None.
+        """
+        with self._lock:
+            challenge = self._challenges.get(host)
+            if challenge is None or challenge.user != user or challenge.passwd != passwd:
+                if challenge is not None:
+                    state = challenge.params, challenge.nc
+                else:
+                    state = self._params.get(host)
+                if state is None:
+                    return None
+                try:
+                    challenge = DigestChallenge(user, passwd, *state)
+                except (KeyError, ValueError):
+                    return None
+                self._challenges[host] = challenge
+            return challenge.authorization(method, uri)
+
+    def update(self, host, user, passwd, header):
+        """Update host state from WWW-Authenticate header.
+
+        Args:
+            host (str): TV host.
+            user (str): User name.
+            passwd (str): User password.
+            header (str): WWW-Authenticate header value.
+
+        Returns:
+            bool: True if the header contained a usable challenge.
+        """
+        params = parse_challenge(header)
+        if params is None:
+            return False
+        try:
+            challenge = DigestChallenge(user, passwd, params)
+        except ValueError:
+            return False
+        with self._lock:
+            self._challenges[host] = challenge
+            self._params[host] = challenge.params, 0
+        self.save()
+        return True
+
+    def forget(self, host):
+        """Drop the state of the host."""
+        with self._lock:
+            self._challenges.pop(host, None)
+            self._params.pop(host, None)
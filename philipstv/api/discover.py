@@ -1,71 +1,311 @@
+import os
+import json
 import requests
 import socket
+import threading
 
-from zeroconf import ServiceBrowser, Zeroconf
+from time import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from zeroconf import ServiceBrowser, ServiceInfo, Zeroconf
 
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+SERVICE_TYPES = ["_androidtvremote._tcp.local.", "_androidtvremote2._tcp.local."]
+
+
+class DiscoveryCache:
+    """Persistent cache of TVs discovered before.
+
+    For every service, its IP, TV name and the time it was last seen are kept. Entries not seen for ``ttl``
+    seconds are dropped. IPs that failed to respond are remembered for ``negative_ttl`` seconds and their entries
+    are not reported in this time.
+
+    Args:
+        path (str, optional): JSON file to store the cache in. If None, the cache is kept in memory only.
+        ttl (float, optional): Time in seconds after which unseen entries expire. Defaults to 30 days.
+        negative_ttl (float, optional): Time in seconds for which failed IPs are remembered. Defaults to 5 minutes.
+    """
+
+    def __init__(self, path=None, ttl=30 * 86400., negative_ttl=300.):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._hosts = {}
+        self._failed = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the cache from the file."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            hosts = {service: (str(ip), str(name), float(seen)) for service, (ip, name, seen) in data['hosts'].items()}
+            failed = {str(ip): float(when) for ip, when in data['failed'].items()}
+        except (OSError, ValueError, TypeError, KeyError):
+            return
+        with self._lock:
+            self._hosts, self._failed = hosts, failed
+
+    def save(self):
+        """Write the cache to the file."""
+        if self.path is None:
+            return
+        with self._lock:
+            data = {'hosts': self._hosts, 'failed': self._failed}
+            tmp = self.path + '.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as file:
+                    json.dump(data, file)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+
+    def entries(self):
+        """Get valid entries, dropping the expired ones.
+
+        Returns:
+            list: Tuples (service name, IP, TV name), most recently seen first.
+        """
+        now = time()
+        with self._lock:
+            self._hosts = {service: entry for service, entry in self._hosts.items() if now - entry[2] < self.ttl}
+            self._failed = {ip: when for ip, when in self._failed.items() if now - when < self.negative_ttl}
+            entries = sorted(self._hosts.items(), key=lambda item: -item[1][2])
+            return [(service, ip, name) for service, (ip, name, seen) in entries if ip not in self._failed]
+
+    def put(self, service_name, ip, name):
+        """Record TV seen now."""
+        with self._lock:
+            self._hosts[service_name] = ip, name, time()
+            self._failed.pop(ip, None)
+
+    def fail(self, ip):
+        """Record IP, which failed to respond."""
+        with self._lock:
+            self._failed[ip] = time()
+
 
 class PhilipsTVListener:
+    """Zeroconf listener resolving discovered services and probing them for Philips API.
+
+    Zeroconf callbacks only schedule work, so they never block. Service info is resolved in a small thread pool
+    and the ``/system`` probes run in a bounded pool, so slow devices do not hold up fast ones. Every TV is
+    reported with ``on_add`` as soon as its probe succeeds.
+
+    Args:
+        on_add (callable, optional): Function called with TV name and IP when a TV is found.
+        on_remove (callable, optional): Function called with TV name and IP when a TV disappears.
+        timeout (float, optional): Timeout of service resolution and ``/system`` probe in seconds. Defaults to 1.0.
+        max_probes (int, optional): Maximum number of concurrent probes. Defaults to 8.
+        cache (DiscoveryCache, optional): Cache updated with probe results.
+    """
 
-    def __init__(self, on_add=None, on_remove=None, timeout=1.0):
+    def __init__(self, on_add=None, on_remove=None, timeout=1.0, max_probes=8, cache=None):
         self.on_add = on_add
         self.on_remove = on_remove
+        self.cache = cache
         self._hosts = {}
+        self._pending = {}
+        self._generation = 0
         self._timeout = timeout
+        self._lock = threading.Lock()
+        self._resolver = ThreadPoolExecutor(max_workers=4, thread_name_prefix='philipstv-resolve')
+        self._prober = ThreadPoolExecutor(max_workers=max_probes, thread_name_prefix='philipstv-probe')
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_probes, pool_maxsize=1)
+        self._session.mount('https://', adapter)
+
+    def reset(self):
+        """Forget all found TVs and drop results of pending probes.
+
+        After this, every TV is reported again when found.
+        """
+        with self._lock:
+            self._generation += 1
+            self._hosts.clear()
+            self._pending.clear()
+
+    def close(self):
+        """Stop worker threads."""
+        self.reset()
+        self._resolver.shutdown(wait=False)
+        self._prober.shutdown(wait=False)
+        self._session.close()
 
     def remove_service(self, zeroconf, service_type, service_name):
+        with self._lock:
+            self._pending.pop(service_name, None)
+            try:
+                ip, name = self._hosts.pop(service_name)
+            except KeyError:
+                return
+        if self.on_remove is not None:
+            self.on_remove(name, ip)
+
+    def add_service(self, zeroconf, service_type, service_name):
+        with self._lock:
+            if service_name in self._hosts or service_name in self._pending:
+                return
+            token = object()
+            self._pending[service_name] = token
         try:
-            ip, name = self._hosts.pop(service_name)
-        except KeyError:
+            self._resolver.submit(self._resolve, zeroconf, service_type, service_name, token)
+        except RuntimeError:  # listener closed
             pass
-        else:
-            if self.on_remove is not None:
-                self.on_remove(name, ip)
 
-    def add_service(self, zeroconf, service_type, service_name):
-        info = zeroconf.get_service_info(service_type, service_name)
-        if info:
-            ip = socket.inet_ntoa(info.addresses[0])
-            try:
-                r = requests.get(f"https://{ip}:1926/6/system", verify=False, timeout=self._timeout)
-                if r.status_code == 200:
-                    name = r.json()['name']
-                else:
-                    raise ValueError(r.text)
-            except Exception as err:
-                pass
+    def update_service(self, zeroconf, service_type, service_name):
+        self.add_service(zeroconf, service_type, service_name)
+
+    def revalidate(self, service_name, ip, name):
+        """Probe TV known from the cache.
+
+        If the probe succeeds, the TV is reported with ``on_add``. Otherwise ``on_remove`` is called with the cached
+        name, so the TV can be taken off the list.
+        """
+        with self._lock:
+            if service_name in self._hosts or service_name in self._pending:
+                return
+            token = object()
+            self._pending[service_name] = token
+        try:
+            self._prober.submit(self._probe, service_name, ip, token, name)
+        except RuntimeError:
+            pass
+
+    def _current(self, service_name, token):
+        return self._pending.get(service_name) is token
+
+    def _resolve(self, zeroconf, service_type, service_name, token):
+        info = ServiceInfo(service_type, service_name)
+        try:
+            found = info.request(zeroconf, int(1000 * self._timeout))
+        except Exception:
+            found = False
+        ips = [socket.inet_ntoa(address) for address in info.addresses if len(address) == 4] if found else []
+        with self._lock:
+            if not self._current(service_name, token):
+                return
+            if not ips:
+                del self._pending[service_name]
+                return
+        try:
+            self._prober.submit(self._probe, service_name, ips[0], token)
+        except RuntimeError:
+            pass
+
+    def _probe(self, service_name, ip, token, cached=None):
+        with self._lock:
+            if not self._current(service_name, token):
+                return
+        try:
+            r = self._session.get(f"https://{ip}:1926/6/system", verify=False, timeout=self._timeout)
+            if r.status_code == 200:
+                name = r.json()['name']
             else:
+                raise ValueError(r.text)
+        except Exception:
+            name = None
+        with self._lock:
+            if not self._current(service_name, token):
+                return
+            del self._pending[service_name]
+            if name is not None:
                 self._hosts[service_name] = ip, name
-                if self.on_add is not None:
-                    self.on_add(name, ip)
+        if self.cache is not None:
+            if name is not None:
+                self.cache.put(service_name, ip, name)
+            else:
+                self.cache.fail(ip)
+        if name is not None:
+            if self.on_add is not None:
+                self.on_add(name, ip)
+        elif cached is not None and self.on_remove is not None:
+            self.on_remove(cached, ip)
 
 
 class PhilipsTVDiscover():
+    """Discovery of Philips TVs in the local network.
+
+    One Zeroconf instance is kept for the lifetime of this object, so discovery can be started and stopped
+    cheaply many times. Call :meth:`close` to release it.
+
+    If a cache is given, TVs found before are reported with ``on_cached`` as soon as the discovery starts and
+    are probed in parallel with mDNS browsing. Then they are reported with ``on_add`` if they respond or with
+    ``on_remove`` if they do not.
+
+    Args:
+        on_add (callable, optional): Function called with TV name and IP when a TV is found.
+        on_remove (callable, optional): Function called with TV name and IP when a TV disappears.
+        timeout (float, optional): Timeout of service resolution and ``/system`` probe in seconds. Defaults to 1.0.
+        max_probes (int, optional): Maximum number of concurrent probes. Defaults to 8.
+        cache (DiscoveryCache, optional): Cache of TVs found before.
+        on_cached (callable, optional): Function called with TV name and IP of not yet verified cached TV.
+    """
 
-    def __init__(self, on_add=None, on_remove=None, timeout=1.0):
+    def __init__(self, on_add=None, on_remove=None, timeout=1.0, max_probes=8, cache=None, on_cached=None):
         self.on_add = on_add
         self.on_remove = on_remove
+        self.on_cached = on_cached
         self.timeout = timeout
+        self.max_probes = max_probes
+        self.cache = cache
         self._zeroconf = None
+        self._listener = None
+        self._browser = None
+
+    def _add(self, name, ip):
+        if self.on_add is not None:
+            self.on_add(name, ip)
+
+    def _remove(self, name, ip):
+        if self.on_remove is not None:
+            self.on_remove(name, ip)
 
     def start(self):
-        self._zeroconf = Zeroconf()
-        listener = PhilipsTVListener(self.on_add, self.on_remove, self.timeout)
-        self._browser = ServiceBrowser(self._zeroconf, ["_androidtvremote._tcp.local.", "_androidtvremote2._tcp.local."], listener)
+        if self._browser is not None:
+            return
+        if self._zeroconf is None:
+            self._zeroconf = Zeroconf()
+            self._listener = PhilipsTVListener(self._add, self._remove, self.timeout, self.max_probes)
+        else:
+            self._listener.reset()
+        self._listener.cache = self.cache
+        if self.cache is not None:
+            for service_name, ip, name in self.cache.entries():
+                if self.on_cached is not None:
+                    self.on_cached(name, ip)
+                self._listener.revalidate(service_name, ip, name)
+        self._browser = ServiceBrowser(self._zeroconf, SERVICE_TYPES, self._listener)
 
     def stop(self):
+        if self._browser is not None:
+            self._browser.cancel()
+            self._browser = None
+            self._listener.reset()
+            if self.cache is not None:
+                self.cache.save()
+
+    def close(self):
+        """Stop discovery and release network resources."""
+        self.stop()
         if self._zeroconf is not None:
+            self._listener.close()
             self._zeroconf.close()
             self._zeroconf = None
-            del self._browser
+            self._listener = None
 
     def __enter__(self):
         self.start()
+        return self
 
     def __exit__(self, type, value, traceback):
-        self.stop()
+        self.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,209 @@
+"""Ambilight effects defined as keyframe timelines.
+
+This module requires NumPy, which is not needed by the rest of the package.
+"""
+import gc
+
+from time import monotonic, sleep
+
+import numpy as np
+
+from .ambilight import AmbilightFrame
+
+EASINGS = {
+    'linear': lambda w: w,
+    'smooth': lambda w: w * w * (3 - 2 * w),
+    'step': np.floor,
+}
+"""Interpolation functions between keyframes."""
+
+
+class Timeline:
+    """Ambilight effect defined by keyframes.
+
+    Every keyframe is a pair of time in seconds and colors, which can be a single RGB color for all zones or
+    an array of shape (layers, sides, zones, 3), like :attr:`AmbilightFrame.data`. Colors between keyframes
+    are interpolated.
+
+    Args:
+        keyframes (list): Pairs (time, colors) sorted by time.
+        easing (str, optional): Interpolation, one of :data:`EASINGS`. Defaults to 'linear'.
+        loop (bool, optional): Whether the timeline is played in a loop. If True, the last keyframe should be
+                               the same as the first one. Defaults to False.
+    """
+
+    def __init__(self, keyframes, easing='linear', loop=False):
+        self.keyframes = list(keyframes)
+        self.easing = easing
+        self.loop = loop
+
+    @property
+    def duration(self):
+        """Time of the last keyframe."""
+        return self.keyframes[-1][0]
+
+    def render(self, topology, fps=25., duration=None):
+        """Render the timeline into a frame buffer.
+
+        All frames are computed at once with vectorized interpolation.
+
+        Args:
+            topology (dict): Ambilight topology.
+            fps (float, optional): Frame rate. Defaults to 25.
+            duration (float, optional): Rendered time. Defaults to the timeline duration, which for looped
+                                        timelines gives a buffer that can be played in a loop.
+
+        Returns:
+            array: Uint8 array of shape (frames, layers, sides, zones, 3).
+        """
+        shape = AmbilightFrame(topology).shape
+        if duration is None:
+            duration = self.duration
+        count = int(round(duration * fps))
+        if not self.loop or count == 0:
+            count += 1  # include the final keyframe
+        times = np.array([time for time, _ in self.keyframes], np.float64)
+        colors = np.empty((len(times),) + shape, np.float32)
+        for i, (_, color) in enumerate(self.keyframes):
+            colors[i] = np.broadcast_to(np.asarray(color, np.float32), shape)
+        t = np.arange(count) / fps
+        if self.loop and self.duration > 0:
+            t %= self.duration
+        index = np.clip(np.searchsorted(times, t, side='right') - 1, 0, len(times) - 1)
+        following = np.minimum(index + 1, len(times) - 1)
+        span = times[following] - times[index]
+        weight = np.divide(t - times[index], span, out=np.zeros_like(t), where=span > 0)
+        weight = EASINGS[self.easing](np.clip(weight, 0., 1.)).astype(np.float32)
+        weight = weight.reshape((-1,) + (1,) * len(shape))
+        frames = colors[index] * (1 - weight) + colors[following] * weight
+        return np.rint(frames, out=frames).astype(np.uint8)
+
+
+def _perimeter(topology):
+    # Zones in clockwise order and their positions along the perimeter in [0, 1)
+    frame = AmbilightFrame(topology)
+    index = np.nonzero(frame.mask[0])
+    return frame.shape, index, np.arange(len(index[0])) / max(len(index[0]), 1)
+
+
+def fade(start, end, duration):
+    """Fade between two colors.
+
+    Args:
+        start, end: Start and end colors.
+        duration (float): Fade time in seconds.
+    """
+    return Timeline([(0., start), (duration, end)], easing='smooth')
+
+
+def breathing(color, period=4., low=0.1):
+    """Slow pulsing of a color.
+
+    Args:
+        color: Full brightness color.
+        period (float, optional): Period in seconds. Defaults to 4.
+        low (float, optional): Lowest brightness relative to the full one. Defaults to 0.1.
+    """
+    dim = np.asarray(color, np.float32) * low
+    return Timeline([(0., dim), (period / 2, color), (period, dim)], easing='smooth', loop=True)
+
+
+def gradient(topology, colors, period=None):
+    """Gradient of colors around the screen, optionally rotating.
+
+    Args:
+        topology (dict): Ambilight topology.
+        colors (list): Colors evenly spread along the perimeter, clockwise from the bottom of the left side.
+        period (float, optional): Rotation period in seconds. If None, the gradient is static.
+    """
+    shape, index, position = _perimeter(topology)
+    stops = np.asarray(list(colors) + [colors[0]], np.float32)
+    where = np.linspace(0., 1., len(stops))
+
+    def frame(shift):
+        values = np.stack([np.interp((position + shift) % 1., where, stops[:, c]) for c in range(3)], axis=-1)
+        result = np.zeros(shape, np.float32)
+        result[:, index[0], index[1]] = values
+        return result
+
+    if period is None:
+        return Timeline([(0., frame(0.))])
+    steps = max(len(position), 1)
+    return Timeline([(period * i / steps, frame(i / steps)) for i in range(steps + 1)], loop=True)
+
+
+def chase(topology, color, background=(0, 0, 0), period=2., width=1):
+    """Highlight running around the screen.
+
+    Args:
+        topology (dict): Ambilight topology.
+        color: Highlight color.
+        background: Background color. Defaults to black.
+        period (float, optional): Time of a full round in seconds. Defaults to 2.
+        width (int, optional): Highlight width in zones. Defaults to 1.
+    """
+    shape, index, position = _perimeter(topology)
+    count = len(position)
+    keyframes = []
+    for i in range(count + 1):
+        frame = np.zeros(shape, np.float32)
+        frame[...] = background
+        lit = (i + np.arange(width)) % max(count, 1)
+        frame[:, index[0][lit], index[1][lit]] = color
+        keyframes.append((period * i / max(count, 1), frame))
+    return Timeline(keyframes, easing='step', loop=True)
+
+
+class EffectPlayer:
+    """Player of rendered effects.
+
+    Frames are pushed to the stream on an absolute schedule, so any delay does not accumulate. The player
+    sleeps until shortly before every frame and spins only for the last ``spin`` seconds. Existing objects are
+    frozen before playback, so garbage collections are short, and collection is disabled only from waking up
+    until the frame is pushed, to keep the timing steady without stopping it for the rest of the application.
+    Network jitter is absorbed by :class:`AmbilightStream`, which drops stale frames.
+
+    Args:
+        stream (AmbilightStream): Started streaming session.
+        fps (float, optional): Frame rate. Defaults to 25.
+        spin (float, optional): Time in seconds spent spinning before each frame. Defaults to 0.001.
+    """
+
+    def __init__(self, stream, fps=25., spin=0.001):
+        self.stream = stream
+        self.fps = fps
+        self.spin = spin
+        self.lateness = None
+        """Array of lateness of every pushed frame in seconds from the last playback."""
+
+    def play(self, frames, repeat=1):
+        """Play frame buffer.
+
+        Args:
+            frames (array): Frames rendered with :meth:`Timeline.render`.
+            repeat (int, optional): Number of times the buffer is played. Defaults to 1.
+        """
+        total = len(frames) * repeat
+        lateness = np.empty(total)
+        enabled = gc.isenabled()
+        gc.collect()
+        gc.freeze()
+        try:
+            start = monotonic()
+            for i in range(total):
+                deadline = start + i / self.fps
+                delay = deadline - monotonic() - self.spin
+                if delay > 0:
+                    sleep(delay)
+                gc.disable()
+                try:
+                    while monotonic() < deadline:
+                        pass
+                    lateness[i] = monotonic() - deadline
+                    self.stream.push(frames[i % len(frames)])
+                finally:
+                    if enabled:
+                        gc.enable()
+        finally:
+            gc.unfreeze()
+        self.lateness = lateness
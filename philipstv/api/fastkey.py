@@ -0,0 +1,197 @@
+import json
+import socket
+import select
+import threading
+
+from time import monotonic
+
+KEYS = (
+    'Standby', 'Back', 'Find', 'RedColour', 'GreenColour', 'YellowColour', 'BlueColour', 'Home', 'VolumeUp', 'VolumeDown',
+    'Mute', 'Options', 'Dot', 'Digit0', 'Digit1', 'Digit2', 'Digit3', 'Digit4', 'Digit5', 'Digit6', 'Digit7', 'Digit8',
+    'Digit9', 'Info', 'CursorUp', 'CursorDown', 'CursorLeft', 'CursorRight', 'Confirm', 'Next', 'Previous', 'Adjust',
+    'WatchTV', 'Viewmode', 'Teletext', 'Subtitle', 'ChannelStepUp', 'ChannelStepDown', 'Source', 'AmbilightOnOff', 'Online',
+    'PlayPause', 'Play', 'Pause', 'FastForward', 'Stop', 'Rewind', 'Record'
+)
+"""Documented remote keys."""
+
+_PATH = '/6/input/key'
+
+
+class FastKeySender:
+    """Low-overhead sender of remote keys.
+
+    Keys are sent over a persistent TLS socket with raw HTTP requests prebuilt for every key, bypassing
+    the requests stack. Only the status line and the headers needed to find the end of the response are parsed.
+    Requests are authorized preemptively with the digest state of the API object, so this works only after
+    the TV nonce is known. If the request cannot be sent, :meth:`send` returns False, in which case the caller
+    should send the key with the generic path.
+
+    Args:
+        api (PhilipsAPI): API object providing the host, credentials, TLS context and timeouts.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self._host = None
+        self._sock = None
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def _build(self, host, key):
+        body = json.dumps({'key': key}).encode('utf-8')
+        head = (f"POST {_PATH} HTTP/1.1\r\nHost: {host}:1926\r\nAccept: application/json\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n").encode('latin-1')
+        return head, body
+
+    def _prepare(self, host):
+        self.close()
+        self._host = host
+        self._templates = {key: self._build(host, key) for key in KEYS}
+
+    def close(self):
+        """Close the socket."""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _socket(self, host, timeout):
+        sock = self._sock
+        if sock is not None:
+            # Idle socket readable means the TV has closed it
+            if not select.select([sock], [], [], 0)[0]:
+                sock.settimeout(timeout)
+                return sock
+            self.close()
+        raw = socket.create_connection((host, 1926), timeout=timeout)
+        raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            sock = self.api._ssl_context.wrap_socket(raw)
+        except BaseException:
+            raw.close()
+            raise
+        self._sock = sock
+        return sock
+
+    def _read(self, sock, data, size):
+        # Read until data has at least size bytes
+        while len(data) < size:
+            chunk = sock.recv(max(size - len(data), 4096))
+            if not chunk:
+                raise ConnectionResetError
+            data += chunk
+        return data
+
+    def _line(self, sock, data):
+        # Read until data contains CRLF and return its position
+        while True:
+            end = data.find(b'\r\n')
+            if end != -1:
+                return data, end
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionResetError
+            data += chunk
+
+    def _response(self, sock):
+        data = b''
+        while True:
+            end = data.find(b'\r\n\r\n')
+            if end != -1:
+                break
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionResetError
+            data += chunk
+        head = data[:end].lower()
+        status = int(data[9:12])
+        rest = data[end + 4:]
+        start = head.find(b'\r\ncontent-length:')
+        if 100 <= status < 200 or status in (204, 304):
+            pass
+        elif start != -1:
+            stop = head.find(b'\r\n', start + 2)
+            self._read(sock, rest, int(head[start + 17:stop if stop != -1 else len(head)]))
+        elif b'\r\ntransfer-encoding: chunked' in head:
+            while True:
+                rest, line = self._line(sock, rest)
+                size = int(rest[:line].split(b';')[0], 16)
+                rest = self._read(sock, rest, line + size + 4)[line + size + 4:]
+                if size == 0:
+                    break  # no trailers are sent by the TV
+        else:
+            # The body ends when the TV closes the connection, so it cannot be reused
+            self.close()
+            return status, data[:end]
+        if b'\r\nconnection: close' in head:
+            self.close()
+        return status, data[:end]
+
+    def send(self, key):
+        """Send remote key.
+
+        The generic path is suggested only if the request has not been sent, so a key is never pressed twice.
+        Once it is sent, any failure is raised. A rejected nonce is renewed and the request is sent again,
+        as the TV does not act on unauthorized requests.
+
+        Args:
+            key (str): Key name.
+
+        Returns:
+            bool: True if the TV accepted the key, False if the generic path should be used.
+
+        Raises:
+            NotRechable: Connection failed after the key was sent.
+            NotAuthorized: The TV rejected the credentials.
+            ApiError: The TV rejected the key.
+        """
+        from . import NotRechable, NotAuthorized, ApiError
+        api = self.api
+        host, user = api.host, api.user
+        if not host or user is None:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if host != self._host:
+                self._prepare(host)
+            try:
+                head, body = self._templates[key]
+            except KeyError:
+                head, body = self._templates[key] = self._build(host, key)
+            timeout = api._remaining(api.rtt.timeout(host, 'input'))
+            for attempt in range(2):
+                auth = api.digest.authorization(host, user, api.passwd, 'POST', _PATH)
+                if auth is None:
+                    return False
+                start = monotonic()
+                try:
+                    sock = self._socket(host, timeout)
+                    sock.sendall(b''.join((head, b'Authorization: ', auth.encode('latin-1'), b'\r\n\r\n', body)))
+                except OSError:
+                    self.close()
+                    return False
+                try:
+                    status, headers = self._response(sock)
+                except (OSError, ValueError) as err:
+                    self.close()
+                    api.health.failure(host)
+                    raise NotRechable() from err
+                if status != 401:
+                    break
+                challenge = None
+                for line in headers.decode('latin-1').split('\r\n'):
+                    name, _, value = line.partition(':')
+                    if name.strip().lower() == 'www-authenticate':
+                        challenge = value.strip()
+                if attempt == 1 or not api.digest.update(host, user, api.passwd, challenge):
+                    raise NotAuthorized()
+            api.health.success(host)
+            if not 200 <= status < 300:
+                raise ApiError(f"Key {key} rejected with HTTP status {status}")
+            api.rtt.sample(host, 'input', monotonic() - start)
+            return True
+        finally:
+            self._lock.release()
@@ -0,0 +1,180 @@
+import threading
+
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import PhilipsAPI, NotRechable
+from .rtt import RttEstimator
+from .health import HealthMonitor
+from .digest import DigestStore
+
+
+class TVGroup:
+    """Group of TVs controlled together.
+
+    Every operation is run concurrently on all members in a thread pool, so its total time is the time
+    of the slowest TV rather than the sum of all of them. Each TV has its own deadline counted from the moment
+    the operation on it starts; TVs exceeding it are reported with :class:`NotRechable` error. The deadline is
+    also applied to the requests of the operation (see :meth:`PhilipsAPI.deadline`), so the worker thread is
+    released at the deadline as well.
+
+    Args:
+        members (iterable, optional): :class:`PhilipsAPI` objects of the TVs.
+        max_workers (int, optional): Maximum number of TVs processed at once. Defaults to 16.
+        deadline (float, optional): Default per-TV deadline in seconds. Defaults to 5.0.
+    """
+
+    def __init__(self, members=(), max_workers=16, deadline=5.0):
+        self.members = {}
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='philipstv-group')
+        self._topologies = {}
+        for api in members:
+            self.add(api)
+
+    @classmethod
+    def from_auth(cls, auth, macs=None, **kwargs):
+        """Create group from the credentials mapping.
+
+        All members share round-trip time estimator, circuit breaker and digest state.
+
+        Args:
+            auth (dict): Mapping of hosts to pairs (user, password), as in ``PhilipsTVApp.auth``.
+            macs (dict, optional): Mapping of hosts to their MAC addresses.
+            kwargs: Arguments passed to the constructor.
+
+        Returns:
+            TVGroup: New group.
+        """
+        if macs is None:
+            macs = {}
+        rtt, health, digest = RttEstimator(), HealthMonitor(), DigestStore()
+        members = [PhilipsAPI(host, user, passwd, macs.get(host), rtt=rtt, health=health, digest=digest)
+                   for host, (user, passwd) in auth.items()]
+        return cls(members, **kwargs)
+
+    @property
+    def hosts(self):
+        """List of member hosts."""
+        return list(self.members)
+
+    def add(self, api):
+        """Add TV to the group."""
+        self.members[api.host] = api
+
+    def remove(self, host):
+        """Remove TV from the group."""
+        self.members.pop(host, None)
+        self._topologies.pop(host, None)
+
+    def close(self):
+        """Stop worker threads, not waiting for unfinished operations."""
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def run(self, operation, *args, hosts=None, deadline=None, **kwargs):
+        """Run operation on all TVs, yielding results as they complete.
+
+        Args:
+            operation (str or callable): Name of :class:`PhilipsAPI` method or function called with the API
+                                         object as its first argument.
+            args: Operation arguments.
+            hosts (iterable, optional): Hosts to run the operation on. Defaults to all members.
+            deadline (float, optional): Per-TV deadline in seconds. Defaults to the group deadline.
+            kwargs: Operation keyword arguments.
+
+        Yields:
+            tuple: Host, result and error. Either result or error is None.
+        """
+        if deadline is None:
+            deadline = self.deadline
+        if hosts is None:
+            hosts = list(self.members)
+        started = {}
+        lock = threading.Lock()
+
+        def call(host, api):
+            with lock:
+                started[host] = monotonic()
+            with api.deadline(deadline):
+                if isinstance(operation, str):
+                    return getattr(api, operation)(*args, **kwargs)
+                return operation(api, *args, **kwargs)
+
+        pending = {self._executor.submit(call, host, self.members[host]): host for host in hosts}
+        while pending:
+            now = monotonic()
+            with lock:
+                deadlines = [started[host] + deadline for host in pending.values() if host in started]
+            timeout = max(min(deadlines) - now, 0.) if deadlines else None
+            done, _ = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                host = pending.pop(future)
+                error = future.exception()
+                yield host, None if error is not None else future.result(), error
+            now = monotonic()
+            with lock:
+                expired = [future for future, host in pending.items()
+                           if host in started and now - started[host] >= deadline]
+            for future in expired:
+                host = pending.pop(future)
+                future.cancel()
+                yield host, None, NotRechable(f"TV {host} did not respond within {deadline:g}s")
+
+    def call(self, operation, *args, **kwargs):
+        """Run operation on all TVs and wait for all of them.
+
+        Arguments are the same as for :meth:`run`.
+
+        Returns:
+            dict: Mapping of hosts to results or exceptions.
+        """
+        return {host: error if error is not None else result
+                for host, result, error in self.run(operation, *args, **kwargs)}
+
+    def send_key(self, key, **kwargs):
+        """Send remote key to all TVs.
+
+        Returns:
+            dict: Mapping of hosts to None or exceptions.
+        """
+        return self.call('send_key', key, **kwargs)
+
+    def update_settings(self, settings, **kwargs):
+        """Update settings on all TVs.
+
+        Returns:
+            dict: Mapping of hosts to results of :meth:`PhilipsAPI.update_settings` or exceptions.
+        """
+        return self.call('update_settings', settings, **kwargs)
+
+    def launch_application(self, package_name, class_name, action='empty', **kwargs):
+        """Launch application on all TVs.
+
+        Returns:
+            dict: Mapping of hosts to None or exceptions.
+        """
+        return self.call('launch_application', package_name, class_name, action, **kwargs)
+
+    def _set_ambilight_color(self, api, color):
+        topology = self._topologies.get(api.host)
+        if topology is None:
+            topology = self._topologies[api.host] = api.get_ambilight_topology()
+        values = {side: {str(n): color for n in range(topology[side])} for side in ('left', 'top', 'right', 'bottom')}
+        api.set_ambilight_expert(topology['layers'], **values)
+
+    def set_ambilight_color(self, r, g, b, **kwargs):
+        """Set uniform ambilight color on all TVs.
+
+        Args:
+            r, g, b (int): Color components in range 0-255.
+
+        Returns:
+            dict: Mapping of hosts to None or exceptions.
+        """
+        return self.call(self._set_ambilight_color, dict(r=r, g=g, b=b), **kwargs)
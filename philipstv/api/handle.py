@@ -0,0 +1,165 @@
+import threading
+
+import requests
+
+from . import PhilipsAPI, NoHost, NotRechable, NotAuthorized, ApiError, DigestAuth, wake_and_wait
+from .digest import DigestStore
+from .rtt import smooth
+
+
+class ConnectionPool:
+    """Connection pool shared by many TV handles.
+
+    Connections are kept for at most ``max_hosts`` TVs, one per TV. When a connection to another TV is needed,
+    the connection to the least recently used one is closed. Digest authentication state of all TVs is kept
+    here as well.
+
+    Args:
+        max_hosts (int, optional): Maximum number of TVs with open connections. Defaults to 32.
+        digest (DigestStore, optional): Digest authentication state. By default a new one is created.
+    """
+
+    def __init__(self, max_hosts=32, digest=None):
+        self.max_hosts = max_hosts
+        self.digest = digest if digest is not None else DigestStore()
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=max_hosts, pool_maxsize=1))
+
+    def open_hosts(self):
+        """Get number of TVs with pooled connections."""
+        return len(self.session.get_adapter('https://').poolmanager.pools)
+
+    def close(self):
+        """Close all connections."""
+        self.session.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    """Get global connection pool used by handles by default."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+class TVHandle:
+    """Lightweight handle of a single TV in a large fleet.
+
+    Unlike :class:`PhilipsAPI`, the handle owns no session, adapter or thread: it only keeps the TV address,
+    credentials, MAC and round-trip time learned from its requests. Requests are sent through a shared
+    :class:`ConnectionPool`.
+
+    Args:
+        host (str): Hostname or IP of the TV.
+        user (str, optional): HTTP user name. Defaults to None.
+        passwd (str, optional): HTTP user password. Defaults to None.
+        mac (str, optional): MAC address of the TV. Used for Wake on LAN. Defaults to None.
+    """
+
+    __slots__ = 'host', 'user', 'passwd', 'mac', 'rtt'
+
+    MIN_TIMEOUT = 0.2
+    MAX_TIMEOUT = 5.0
+    INITIAL_TIMEOUT = 0.5
+    WAKE_TIMEOUT = 20.0
+
+    def __init__(self, host, user=None, passwd=None, mac=None):
+        self.host = host
+        self.user = user
+        self.passwd = passwd
+        self.mac = mac
+        self.rtt = None
+
+    def __repr__(self):
+        return f"TVHandle({self.host!r})"
+
+    @property
+    def timeout(self):
+        """Request timeout learned from round-trip times."""
+        if self.rtt is None:
+            return self.INITIAL_TIMEOUT
+        srtt, rttvar = self.rtt
+        return min(max(srtt + 4 * rttvar, self.MIN_TIMEOUT), self.MAX_TIMEOUT)
+
+    def _process(self, method, path, body=None, timeout=None, pool=None):
+        if not self.host: raise NoHost()
+        if pool is None:
+            pool = default_pool()
+        if timeout is None:
+            timeout = self.timeout
+        auth = DigestAuth(pool.digest, self.user, self.passwd) if self.user is not None else None
+        for i in range(2):
+            try:
+                resp = pool.session.request(method, f"https://{self.host}:1926/6/{path}", json=body, verify=False,
+                                            auth=auth, timeout=timeout)
+            except requests.Timeout as err:
+                if i == 1 or self.mac and not self._wake(pool):
+                    raise NotRechable() from err
+                timeout *= 2
+                continue
+            except requests.ConnectionError as err:
+                raise NotRechable() from err
+            if i == 0:
+                self.rtt = smooth(self.rtt, resp.elapsed.total_seconds())
+            if resp.status_code == 200:
+                try:
+                    return resp.json()
+                except ValueError:
+                    return resp.text
+            elif resp.status_code == 401:
+                raise NotAuthorized()
+            raise ApiError(response=resp)
+
+    def _wake(self, pool):
+        # Wake the TV and wait until it answers, so the retry does not time out while it is starting
+        def probe(timeout):
+            return pool.session.get(f"https://{self.host}:1926/6/system", verify=False, timeout=timeout).status_code == 200
+        return wake_and_wait(self.host, self.mac, self.WAKE_TIMEOUT, probe=probe)
+
+    def get(self, path, timeout=None, pool=None):
+        """Generic GET request.
+
+        Args:
+            path (str): API path.
+            timeout (float, optional): Timeout. If missing, the learned one is used.
+            pool (ConnectionPool, optional): Connection pool. Defaults to the global one.
+
+        Returns:
+            Response JSON.
+        """
+        return self._process('GET', path, None, timeout, pool)
+
+    def post(self, path, body, timeout=None, pool=None):
+        """Generic POST request.
+
+        Args:
+            path (str): API path.
+            body: Request JSON.
+            timeout (float, optional): Timeout. If missing, the learned one is used.
+            pool (ConnectionPool, optional): Connection pool. Defaults to the global one.
+
+        Returns:
+            Response JSON.
+        """
+        return self._process('POST', path, body, timeout, pool)
+
+    def send_key(self, key, pool=None):
+        """Send remote key to the TV."""
+        self.post('input/key', {'key': key}, pool=pool)
+
+    def get_system(self, pool=None):
+        """Get system info from the TV."""
+        return self.get('system', pool=pool)
+
+    def api(self, **kwargs):
+        """Create full :class:`PhilipsAPI` object for this TV.
+
+        Args:
+            kwargs: Additional arguments passed to :class:`PhilipsAPI`.
+        """
+        return PhilipsAPI(self.host, self.user, self.passwd, self.mac, **kwargs)
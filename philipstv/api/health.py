@@ -0,0 +1,139 @@
+import socket
+import threading
+
+from time import monotonic
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class HealthMonitor:
+    """Circuit breaker tracking reachability of TV hosts.
+
+    Every host starts in the ``closed`` state, in which all requests are allowed. After ``threshold`` consecutive
+    failures the host becomes ``open``: requests should fail immediately and the TV port is probed in
+    a background thread. When the probe succeeds, the host becomes ``half-open`` and listeners are notified.
+    In this state a single trial request is allowed: if it succeeds, the circuit is closed, while a failure
+    opens it again. Callers allowed to send a request must report its result with :meth:`success` or
+    :meth:`failure`; if they do not within ``trial_timeout``, another trial is allowed.
+
+    Call :meth:`close` to stop all probes when the monitor is no longer needed.
+
+    Args:
+        threshold (int, optional): Number of consecutive failures opening the circuit. Defaults to 1.
+        probe_interval (float, optional): Interval between background probes in seconds. Defaults to 2.0.
+        probe_timeout (float, optional): Timeout of a single probe in seconds. Defaults to 1.0.
+        trial_timeout (float, optional): Time after which an unreported trial request is given up in seconds.
+                                         Defaults to 30.0.
+    """
+
+    def __init__(self, threshold=1, probe_interval=2.0, probe_timeout=1.0, trial_timeout=30.0):
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.trial_timeout = trial_timeout
+        self._states = {}
+        self._failures = {}
+        self._trials = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def state(self, host):
+        """Get circuit state of the host.
+
+        Returns:
+            str: One of 'closed', 'open', 'half-open'.
+        """
+        return self._states.get(host, CLOSED)
+
+    def allow(self, host):
+        """Check if a request to the host is allowed.
+
+        In the half-open state only the first caller is allowed, until its result is reported.
+
+        Returns:
+            bool: False if the host is known to be down or a trial request is in progress.
+        """
+        state = self._states.get(host, CLOSED)
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        with self._lock:
+            if self._states.get(host, CLOSED) != HALF_OPEN:
+                return self._states.get(host, CLOSED) == CLOSED
+            now = monotonic()
+            if now - self._trials.get(host, -self.trial_timeout) < self.trial_timeout:
+                return False
+            self._trials[host] = now
+            return True
+
+    def success(self, host):
+        """Record successful request to the host."""
+        with self._lock:
+            self._failures.pop(host, None)
+            self._states.pop(host, None)
+            self._trials.pop(host, None)
+
+    def failure(self, host):
+        """Record failed request to the host."""
+        with self._lock:
+            self._trials.pop(host, None)
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            state = self._states.get(host, CLOSED)
+            if state == OPEN or state == CLOSED and failures < self.threshold:
+                return
+            self._states[host] = OPEN
+            if self._closed.is_set():
+                return
+        threading.Thread(target=self._probe, args=(host,), name=f'philipstv-probe-{host}', daemon=True).start()
+
+    def close(self):
+        """Stop all background probes."""
+        self._closed.set()
+
+    def reset(self, host=None):
+        """Forget the state of the host or all hosts."""
+        with self._lock:
+            if host is None:
+                self._states.clear()
+                self._failures.clear()
+                self._trials.clear()
+            else:
+                self._states.pop(host, None)
+                self._failures.pop(host, None)
+                self._trials.pop(host, None)
+
+    def add_listener(self, callback):
+        """Add function called with the host name, when the host becomes reachable again.
+
+        The function is called from a background thread.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Remove function added with :meth:`add_listener`."""
+        self._listeners.remove(callback)
+
+    def _probe(self, host):
+        while not self._closed.wait(self.probe_interval):
+            if self._states.get(host) != OPEN:
+                return
+            try:
+                with socket.create_connection((host, 1926), timeout=self.probe_timeout):
+                    pass
+            except OSError:
+                continue
+            with self._lock:
+                if self._states.get(host) != OPEN:
+                    return
+                self._states[host] = HALF_OPEN
+            for callback in list(self._listeners):
+                try:
+                    callback(host)
+                except Exception:
+                    pass
+            return
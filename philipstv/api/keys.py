@@ -0,0 +1,81 @@
+import threading
+from collections import deque
+
+REPEATABLE_KEYS = frozenset((
+    'VolumeUp', 'VolumeDown', 'ChannelStepUp', 'ChannelStepDown', 'CursorUp', 'CursorDown', 'CursorLeft', 'CursorRight'
+))
+"""Keys, which auto-repeats may be merged if the TV cannot keep up."""
+
+
+class KeyQueue:
+    """Ordered queue of remote keys for a single TV.
+
+    Keys are sent one after another from a background thread, so the caller never waits for the TV and
+    consecutive keys reuse the same keep-alive connection. Auto-repeated keys (see :data:`REPEATABLE_KEYS`)
+    are merged when the queue falls behind: while a repeat of some key is still waiting in the queue, further
+    repeats of the same key are dropped. All queued repeats can be discarded with :meth:`release` as soon as
+    the user releases the button.
+
+    Args:
+        api (PhilipsAPI): API object used to send keys.
+        on_error (function, optional): Function called with the exception if sending a key fails.
+                                       It is called from the background thread.
+    """
+
+    def __init__(self, api, on_error=None):
+        self.api = api
+        self.on_error = on_error
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def put(self, key, repeat=False):
+        """Queue key for sending.
+
+        Args:
+            key (str): Key name.
+            repeat (bool, optional): True if this is an auto-repeat of a held button.
+
+        Returns:
+            bool: False if the key was merged with an already queued repeat.
+        """
+        with self._cond:
+            if repeat and key in REPEATABLE_KEYS and self._queue and self._queue[-1] == (key, True):
+                return False
+            self._queue.append((key, repeat))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='philipstv-keys', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def release(self, key=None):
+        """Drop queued auto-repeats.
+
+        Args:
+            key (str, optional): Drop repeats of this key only. By default all repeats are dropped.
+        """
+        with self._cond:
+            self._queue = deque(item for item in self._queue if not item[1] or key is not None and item[0] != key)
+
+    def clear(self):
+        """Drop all queued keys."""
+        with self._cond:
+            self._queue.clear()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                key, repeat = self._queue.popleft()
+            try:
+                self.api.send_key(key)
+            except Exception as err:
+                # Do not report the same problem for every queued key
+                self.clear()
+                if self.on_error is not None:
+                    self.on_error(err)
@@ -0,0 +1,174 @@
+import random
+import asyncio
+
+from time import monotonic
+
+from . import NotRechable
+from .aio import AsyncPhilipsAPI, BackgroundLoop
+from .rtt import RttEstimator
+from .digest import DigestStore
+
+READS = {
+    'system': 'system',
+    'powerstate': 'powerstate',
+    'volume': 'audio/volume',
+    'activity': 'activities/current',
+}
+"""Default status items and their API paths."""
+
+
+class StatusPoller:
+    """Periodic status poller of many TVs.
+
+    Every TV is polled in its own asyncio task: all status items are read concurrently, the result is compared
+    with the previous snapshot and only changed items are sent to subscribers. Intervals are jittered, so
+    the requests of many TVs do not come in bursts, and the number of TVs polled at once is limited.
+    Unreachable TVs are polled with exponentially growing intervals.
+
+    Subscribers are called from the poller event loop with the host and a dictionary of changed items. Items
+    that could not be read are reported as None. Reachability changes are reported as ``'reachable'`` item.
+
+    TVs are never woken up by the poller, so members should not have their MAC set.
+
+    Args:
+        members (iterable, optional): :class:`AsyncPhilipsAPI` objects of the TVs.
+        interval (float, optional): Polling interval in seconds. Defaults to 5.0.
+        jitter (float, optional): Relative random variation of the interval. Defaults to 0.2.
+        concurrency (int, optional): Maximum number of TVs polled at once. Defaults to 64.
+        max_backoff (float, optional): Maximum polling interval of unreachable TVs in seconds. Defaults to 60.0.
+        reads (dict, optional): Mapping of status items to API paths. Defaults to :data:`READS`.
+    """
+
+    def __init__(self, members=(), interval=5.0, jitter=0.2, concurrency=64, max_backoff=60.0, reads=None):
+        self.members = {api.host: api for api in members}
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.max_backoff = max_backoff
+        self.reads = dict(reads if reads is not None else READS)
+        self.polls = 0
+        """Number of completed polls."""
+        self._snapshots = {}
+        self._subscribers = []
+        self._background = BackgroundLoop('philipstv-poller')
+
+    @classmethod
+    def from_auth(cls, auth, **kwargs):
+        """Create poller from the credentials mapping.
+
+        All members share round-trip time estimator and digest state.
+
+        Args:
+            auth (dict): Mapping of hosts to pairs (user, password), as in ``PhilipsTVApp.auth``.
+            kwargs: Arguments passed to the constructor.
+
+        Returns:
+            StatusPoller: New poller.
+        """
+        rtt, digest = RttEstimator(), DigestStore()
+        members = [AsyncPhilipsAPI(host, user, passwd, repeats=2, rtt=rtt, digest=digest)
+                   for host, (user, passwd) in auth.items()]
+        return cls(members, **kwargs)
+
+    def subscribe(self, callback):
+        """Add function called with host and dictionary of changed items."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove function added with :meth:`subscribe`."""
+        self._subscribers.remove(callback)
+
+    def snapshot(self, host):
+        """Get last known status of the host.
+
+        Returns:
+            dict: Status items or None if the host has not been polled yet.
+        """
+        snapshot = self._snapshots.get(host)
+        return dict(snapshot) if snapshot is not None else None
+
+    async def _read(self, api, path):
+        try:
+            return await api.get(path)
+        except NotRechable:
+            raise
+        except Exception:
+            return None
+
+    async def poll(self, api):
+        """Poll single TV once and notify subscribers of changes.
+
+        Returns:
+            bool: True if the TV was reachable.
+        """
+        reads = [asyncio.ensure_future(self._read(api, path)) for path in self.reads.values()]
+        try:
+            values = await asyncio.gather(*reads)
+        except NotRechable:
+            current = {'reachable': False}
+        else:
+            current = dict(zip(self.reads, values))
+            current['reachable'] = True
+        finally:
+            # Do not leave other reads running when one of them fails
+            for read in reads:
+                read.cancel()
+            await asyncio.gather(*reads, return_exceptions=True)
+        self.polls += 1
+        previous = self._snapshots.get(api.host, {})
+        if current['reachable']:
+            changes = {key: value for key, value in current.items() if previous.get(key, ()) != value}
+            self._snapshots[api.host] = current
+        else:
+            changes = {'reachable': False} if previous.get('reachable', True) else {}
+            self._snapshots[api.host] = dict(previous, reachable=False)
+        if changes:
+            for callback in list(self._subscribers):
+                try:
+                    callback(api.host, changes)
+                except Exception:
+                    pass
+        return current['reachable']
+
+    async def _run_host(self, api, slots):
+        failures = 0
+        # Spread the first polls over one interval
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            start = monotonic()
+            async with slots:
+                reachable = await self.poll(api)
+            failures = 0 if reachable else failures + 1
+            # Back off from at least a second, so a zero interval does not poll a dead TV in a tight loop
+            base = max(self.interval, 1.) if failures else self.interval
+            interval = min(base * 2**failures, max(self.max_backoff, self.interval))
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(max(interval - (monotonic() - start), 0.))
+
+    async def run(self):
+        """Poll all TVs until cancelled."""
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._run_host(api, slots)) for api in self.members.values()]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for api in self.members.values():
+                await api.close()
+
+    def start(self):
+        """Start polling in a background thread."""
+        self._background.start(self.run)
+
+    def stop(self):
+        """Stop background polling."""
+        self._background.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
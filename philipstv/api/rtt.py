@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+
+
+def endpoint_class(path):
+    """Get class of the API endpoint used for timing statistics.
+
+    Args:
+        path (str): API path.
+
+    Returns:
+        str: Endpoint class, which is the first component of the path.
+    """
+    return path.split('/', 1)[0]
+
+
+def smooth(stats, rtt, alpha=1 / 8, beta=1 / 4):
+    """Update smoothed round-trip time and its variance with new sample (RFC 6298).
+
+    Args:
+        stats (tuple): Smoothed round-trip time and its variance or None if nothing has been measured yet.
+        rtt (float): Measured round-trip time in seconds.
+        alpha (float, optional): Smoothing factor of the round-trip time. Defaults to 1/8.
+        beta (float, optional): Smoothing factor of the variance. Defaults to 1/4.
+
+    Returns:
+        tuple: Updated smoothed round-trip time and its variance.
+    """
+    if stats is None:
+        return rtt, rtt / 2
+    srtt, rttvar = stats
+    rttvar = (1 - beta) * rttvar + beta * abs(srtt - rtt)
+    srtt = (1 - alpha) * srtt + alpha * rtt
+    return srtt, rttvar
+
+
+class RttEstimator:
+    """Round-trip time estimator for TV requests.
+
+    For every host and endpoint class, smoothed round-trip time and its variance are computed in the same
+    way as TCP retransmission timeout (RFC 6298). Request timeouts and number of attempts are derived from them.
+
+    Args:
+        path (str, optional): JSON file to store learned values in. If None, they are kept in memory only.
+        initial (float, optional): Timeout used before anything is measured. Defaults to 0.5.
+        min_timeout (float, optional): Minimum timeout. Defaults to 0.2.
+        max_timeout (float, optional): Maximum timeout. Defaults to 5.0.
+        budget (float, optional): Total time in seconds all attempts of a request may take. Defaults to 4.0.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, path=None, initial=0.5, min_timeout=0.2, max_timeout=5.0, budget=4.0):
+        self.path = path
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.budget = budget
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load learned values from the file."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            with self._lock:
+                self._stats = {(host, cls): (float(srtt), float(rttvar)) for host, cls, srtt, rttvar in data}
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def save(self):
+        """Write learned values to the file."""
+        if self.path is None:
+            return
+        with self._lock:
+            data = [[host, cls, srtt, rttvar] for (host, cls), (srtt, rttvar) in self._stats.items()]
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def sample(self, host, cls, rtt):
+        """Add measured round-trip time.
+
+        Only requests answered in the first attempt should be sampled.
+
+        Args:
+            host (str): TV host.
+            cls (str): Endpoint class.
+            rtt (float): Measured round-trip time in seconds.
+        """
+        key = host, cls
+        with self._lock:
+            self._stats[key] = smooth(self._stats.get(key), rtt, self.ALPHA, self.BETA)
+
+    def estimate(self, host, cls):
+        """Get smoothed round-trip time and its variance.
+
+        Returns:
+            tuple: Smoothed round-trip time and its variance or None if nothing has been measured.
+        """
+        return self._stats.get((host, cls))
+
+    def timeout(self, host, cls):
+        """Get request timeout.
+
+        Args:
+            host (str): TV host.
+            cls (str): Endpoint class.
+
+        Returns:
+            float: Timeout in seconds.
+        """
+        try:
+            srtt, rttvar = self._stats[host, cls]
+        except KeyError:
+            return self.initial
+        return min(max(srtt + self.K * rttvar, self.min_timeout), self.max_timeout)
+
+    def attempts(self, host, cls, limit):
+        """Get number of request attempts fitting in the time budget.
+
+        The timeout is doubled in each attempt. At least two attempts are always made, so the TV can be woken up.
+
+        Args:
+            host (str): TV host.
+            cls (str): Endpoint class.
+            limit (int): Maximum number of attempts.
+
+        Returns:
+            int: Number of attempts.
+        """
+        if (host, cls) not in self._stats:
+            return limit
+        timeout = self.timeout(host, cls)
+        attempts, total = 0, 0.
+        while attempts < limit:
+            total += timeout * 2**attempts
+            if total > self.budget:
+                break
+            attempts += 1
+        return max(attempts, min(2, limit))
@@ -0,0 +1,218 @@
+"""Capture of colors shown by ambilight into a ring buffer.
+
+This module requires NumPy, which is not needed by the rest of the package.
+"""
+import os
+import json
+import struct
+import threading
+
+from time import monotonic, time, sleep
+
+import numpy as np
+
+from .ambilight import AmbilightFrame, SIDES
+
+MAGIC = b'PTVAMBI1'
+"""Recording file signature."""
+
+
+class AmbilightSampler:
+    """Sampler of colors shown by ambilight.
+
+    The TV ``ambilight/measured`` or ``ambilight/processed`` endpoint is polled from a background thread and
+    every sample is stored in a preallocated ring buffer of shape (capacity, zones, 3), where zones are all
+    zones of all layers, in the order of :class:`AmbilightFrame` existing zones. Consumers get views of
+    the buffer, so no data is copied; a view is valid until the sampler overwrites its rows.
+
+    Zones missing in a response are stored as black, so a sample never contains colors of an older one.
+    Every poll is a single request without retries or waking the TV up; failed polls are skipped.
+
+    Samples can be recorded to a binary file: a header with the topology followed by fixed-size records
+    of a float64 timestamp and uint8 colors. Use :func:`load_recording` to read it.
+
+    Args:
+        api (PhilipsAPI): TV API.
+        source (str, optional): 'measured' or 'processed'. Defaults to 'measured'.
+        capacity (int, optional): Number of samples in the buffer. Defaults to 1024.
+        rate (float, optional): Maximum sampling rate. If None, the TV is polled as fast as it responds.
+                                Defaults to 50.
+        on_error (callable, optional): Function called with the exception when polling fails.
+    """
+
+    def __init__(self, api, source='measured', capacity=1024, rate=50.0, on_error=None):
+        self.api = api
+        self.source = source
+        self.capacity = capacity
+        self.rate = rate
+        self.on_error = on_error
+        self.topology = None
+        self.buffer = None
+        """Ring buffer of shape (capacity, zones, 3)."""
+        self.times = None
+        """Timestamps of the samples in the ring buffer (wall-clock time)."""
+        self.count = 0
+        """Total number of samples taken."""
+        self._keys = None
+        self._record = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def _prepare(self, topology):
+        self.topology = topology
+        frame = AmbilightFrame(topology)
+        self._keys = [(f"layer{frame.layers[l]}", SIDES[s], str(n)) for l, s, n in zip(*np.nonzero(frame.mask))]
+        self.buffer = np.zeros((self.capacity, len(self._keys), 3), np.uint8)
+        self.times = np.zeros(self.capacity, np.float64)
+        self.count = 0
+
+    def start(self, topology=None):
+        """Start sampling.
+
+        Args:
+            topology (dict, optional): Ambilight topology. If not given, it is read from the TV.
+        """
+        if self._thread is not None:
+            return
+        if topology is None:
+            topology = self.api.get_ambilight_topology()
+        self._prepare(topology)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='philipstv-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and recording."""
+        if self._thread is not None:
+            self._running = False
+            self._thread.join()
+            self._thread = None
+        self.stop_recording()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def record(self, path):
+        """Start recording samples to a file.
+
+        Args:
+            path (str): Output file path.
+
+        Raises:
+            RuntimeError: Sampling has not been started, so the topology is not known.
+        """
+        if self._keys is None:
+            raise RuntimeError("Start the sampler before recording")
+        header = json.dumps(self.topology).encode('utf-8')
+        file = open(path, 'wb')
+        file.write(MAGIC + struct.pack('<II', len(self._keys), len(header)) + header)
+        with self._lock:
+            previous, self._record = self._record, file
+        if previous is not None:
+            previous.close()
+
+    def stop_recording(self):
+        """Stop recording samples."""
+        with self._lock:
+            if self._record is not None:
+                self._record.close()
+                self._record = None
+
+    def _store(self, colors, timestamp):
+        row = self.count % self.capacity
+        target = self.buffer[row]
+        for i, (layer, side, zone) in enumerate(self._keys):
+            try:
+                color = colors[layer][side][zone]
+                target[i] = color['r'], color['g'], color['b']
+            except (KeyError, TypeError):
+                target[i] = 0
+        self.times[row] = timestamp
+        with self._lock:
+            if self._record is not None:
+                self._record.write(self.times[row:row + 1].tobytes())
+                self._record.write(target.tobytes())
+        self.count += 1
+
+    def _run(self):
+        path = f'ambilight/{self.source}'
+        step = 1. / self.rate if self.rate else 0.
+        next_time = monotonic()
+        while self._running:
+            if step:
+                delay = next_time - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                next_time = max(next_time + step, monotonic())
+            try:
+                # A late sample is useless, so it is never retried and the TV is never woken up
+                colors = self.api.get(path, retry=False)
+            except Exception as err:
+                if self.on_error is not None:
+                    self.on_error(err)
+                sleep(max(step, 0.1))
+                continue
+            self._store(colors, time())
+
+    def latest(self):
+        """Get the last sample.
+
+        Returns:
+            array: View of shape (zones, 3) or None if nothing has been sampled.
+        """
+        if self.count == 0:
+            return None
+        return self.buffer[(self.count - 1) % self.capacity]
+
+    def segments(self, n=None):
+        """Get the last samples as views of the ring buffer.
+
+        As the samples may wrap around the buffer end, they are returned in up to two chronological segments.
+
+        Args:
+            n (int, optional): Number of samples. Defaults to all samples in the buffer.
+
+        Returns:
+            list: Pairs (times, colors) of views of the buffer, the older one first.
+        """
+        count = self.count
+        available = min(count, self.capacity)
+        n = available if n is None else min(n, available)
+        if n == 0:
+            return []
+        end = count % self.capacity or self.capacity
+        start = end - n
+        if start >= 0:
+            return [(self.times[start:end], self.buffer[start:end])]
+        return [(self.times[start:], self.buffer[start:]), (self.times[:end], self.buffer[:end])]
+
+
+def load_recording(path):
+    """Load samples recorded by :class:`AmbilightSampler`.
+
+    Args:
+        path (str): Recording file path.
+
+    Returns:
+        tuple: Topology dict, timestamps array and colors array of shape (samples, zones, 3). The arrays are
+               views of a memory-mapped file.
+    """
+    with open(path, 'rb') as file:
+        head = file.read(len(MAGIC) + 8)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not an ambilight recording")
+        zones, size = struct.unpack('<II', head[len(MAGIC):])
+        topology = json.loads(file.read(size).decode('utf-8'))
+    dtype = np.dtype([('time', '<f8'), ('colors', np.uint8, (zones, 3))])
+    offset = len(MAGIC) + 8 + size
+    count = (os.path.getsize(path) - offset) // dtype.itemsize  # ignore incomplete last record
+    if count == 0:
+        records = np.zeros(0, dtype)
+    else:
+        records = np.memmap(path, dtype, 'r', offset=offset, shape=(count,))
+    return topology, records['time'], records['colors']
@@ -0,0 +1,162 @@
+import ssl
+import json
+import socket
+import asyncio
+import ipaddress
+
+from time import monotonic
+
+from .aio import _Connection, BackgroundLoop
+
+
+def local_networks(prefix=24):
+    """Guess the local IPv4 network.
+
+    The address of the interface used for the default route is taken. No packets are sent.
+
+    Args:
+        prefix (int, optional): Network prefix length. Defaults to 24.
+
+    Returns:
+        list: List with a single ``ipaddress.IPv4Network`` or empty list if there is no network.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect(('192.0.2.1', 9))
+        ip = sock.getsockname()[0]
+    except OSError:
+        return []
+    finally:
+        sock.close()
+    if ip.startswith('127.') or ip == '0.0.0.0':
+        return []
+    return [ipaddress.ip_network(f"{ip}/{prefix}", strict=False)]
+
+
+class SubnetScanner:
+    """Discovery of Philips TVs by sweeping IP ranges.
+
+    This is an alternative to :class:`~philipstv.api.discover.PhilipsTVDiscover` for networks where mDNS
+    is filtered. Every address is probed by connecting to port 1926 and requesting ``/6/system``. Probes run
+    concurrently in a single asyncio event loop, but no more than ``concurrency`` at once, and every probe
+    is limited by its own deadline. TVs are reported with ``on_add`` as soon as they respond.
+
+    The scan can be run headless with :meth:`scan` or :meth:`run`, or in a background thread with :meth:`start`.
+
+    Args:
+        networks (list, optional): Networks to scan, as strings in CIDR notation or ``ipaddress.IPv4Network``.
+                                   By default the local network is guessed.
+        on_add (callable, optional): Function called with TV name and IP when a TV is found.
+        concurrency (int, optional): Maximum number of simultaneous probes. Defaults to 128.
+        timeout (float, optional): Deadline of a single probe in seconds. Defaults to 1.0.
+        connect_timeout (float, optional): Time to wait for connection and TLS handshake in seconds.
+                                           Defaults to 0.5.
+    """
+
+    def __init__(self, networks=None, on_add=None, concurrency=128, timeout=1.0, connect_timeout=0.5):
+        if networks is None:
+            networks = local_networks()
+        self.networks = [ipaddress.ip_network(net, strict=False) for net in networks]
+        self.on_add = on_add
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.elapsed = None
+        self._ssl = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+        self._background = BackgroundLoop('philipstv-scan')
+
+    def addresses(self):
+        """Iterate over all addresses to scan."""
+        seen = set()
+        for net in self.networks:
+            for ip in net.hosts() if net.num_addresses > 1 else net:
+                if ip not in seen:
+                    seen.add(ip)
+                    yield str(ip)
+
+    async def _probe(self, ip):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, 1926, ssl=self._ssl),
+                                                self.connect_timeout)
+        conn = _Connection(reader, writer)
+        try:
+            resp = await conn.request('GET', ip, '/6/system', {'Accept': 'application/json'}, b'')
+        finally:
+            conn.close()
+        if resp.status_code != 200:
+            return None
+        return json.loads(resp.content)['name']
+
+    async def probe(self, ip):
+        """Probe single address.
+
+        Args:
+            ip (str): IP address.
+
+        Returns:
+            str: TV name or None if there is no TV at the address.
+        """
+        try:
+            return await asyncio.wait_for(self._probe(ip), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, KeyError, TypeError):
+            return None
+
+    async def scan(self):
+        """Scan all addresses.
+
+        Returns:
+            list: Tuples (name, IP) of all found TVs.
+        """
+        found = []
+        addresses = self.addresses()
+        start = monotonic()
+
+        async def worker():
+            for ip in addresses:
+                name = await self.probe(ip)
+                if name is not None:
+                    found.append((name, ip))
+                    if self.on_add is not None:
+                        self.on_add(name, ip)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        self.elapsed = monotonic() - start
+        return found
+
+    def run(self):
+        """Scan all addresses, blocking until finished.
+
+        Returns:
+            list: Tuples (name, IP) of all found TVs.
+        """
+        return asyncio.run(self.scan())
+
+    def start(self):
+        """Start scan in a background thread."""
+        self._background.start(self.scan)
+
+    def stop(self):
+        """Cancel background scan."""
+        self._background.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import sys
+
+    def add(name, ip):
+        print(f"Add: {name} @ {ip}")
+
+    scanner = SubnetScanner(sys.argv[1:] or None, add)
+    if not scanner.networks:
+        sys.exit("No network to scan")
+    print("Scanning", ', '.join(str(net) for net in scanner.networks))
+    scanner.run()
+    print(f"Finished in {scanner.elapsed:.2f}s")
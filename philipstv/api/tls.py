@@ -0,0 +1,108 @@
+import ssl
+import weakref
+import threading
+
+import requests
+
+
+class _ResumingSocket(ssl.SSLSocket):
+
+    _resume_key = None
+
+    def _real_close(self):
+        # With TLS 1.3 the session ticket arrives after the handshake, so store the session once more on close
+        if self._resume_key is not None:
+            try:
+                session = self.session
+            except (AttributeError, ValueError):
+                session = None
+            if session is not None:
+                self.context._store_session(self._resume_key, session)
+        super()._real_close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSL context resuming TLS sessions on reconnects.
+
+    The session of the last connection to every peer is remembered and offered when a new connection to
+    the same peer is made, so the full TLS handshake is avoided if the server supports session resumption.
+    Certificates are not verified, as TVs use self-signed ones.
+    """
+
+    sslsocket_class = _ResumingSocket
+
+    def __new__(cls):
+        return super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+
+    def __init__(self):
+        super().__init__()
+        self.check_hostname = False
+        self.verify_mode = ssl.CERT_NONE
+        self._sessions = {}
+        self._sockets = {}
+        self._sessions_lock = threading.Lock()
+
+    def _session(self, key):
+        with self._sessions_lock:
+            ref = self._sockets.get(key)
+            sock = ref() if ref is not None else None
+            if sock is not None:
+                try:
+                    session = sock.session
+                except (AttributeError, ValueError):
+                    session = None
+                if session is not None:
+                    self._sessions[key] = session
+            return self._sessions.get(key)
+
+    def _store_session(self, key, session):
+        with self._sessions_lock:
+            self._sessions[key] = session
+
+    def wrap_socket(self, sock, *args, session=None, **kwargs):
+        try:
+            key = sock.getpeername()[:2]
+        except OSError:
+            key = None
+        if session is None and key is not None:
+            session = self._session(key)
+        try:
+            ssock = super().wrap_socket(sock, *args, session=session, **kwargs)
+        except ValueError:
+            # Session not usable with this connection
+            ssock = super().wrap_socket(sock, *args, **kwargs)
+        if key is not None:
+            ssock._resume_key = key
+            with self._sessions_lock:
+                self._sockets[key] = weakref.ref(ssock)
+                if ssock.session is not None:
+                    self._sessions[key] = ssock.session
+        return ssock
+
+    def forget(self, host=None):
+        """Forget stored sessions of all peers or the given host."""
+        with self._sessions_lock:
+            if host is None:
+                self._sessions.clear()
+                self._sockets.clear()
+            else:
+                for store in self._sessions, self._sockets:
+                    for key in [key for key in store if key[0] == host]:
+                        del store[key]
+
+
+class TLSAdapter(requests.adapters.HTTPAdapter):
+    """Requests transport adapter using :class:`ResumingSSLContext`.
+
+    Args:
+        ssl_context (ResumingSSLContext, optional): SSL context to use. By default a new one is created.
+        kwargs: Arguments passed to ``requests.adapters.HTTPAdapter``.
+    """
+
+    def __init__(self, ssl_context=None, **kwargs):
+        self.ssl_context = ssl_context if ssl_context is not None else ResumingSSLContext()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
@@ -0,0 +1,267 @@
+"""Ambilight colors computed from video files and image sequences.
+
+This module requires NumPy. Reading video files requires OpenCV (``cv2``) or ``imageio``, and reading
+images requires ``imageio`` or Pillow. None of them is needed by the rest of the package.
+"""
+import os
+
+from time import monotonic, sleep
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .ambilight import AmbilightFrame
+
+
+class VideoSource:
+    """Frames of a video file.
+
+    Args:
+        path (str): Video file path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            try:
+                import cv2
+            except ImportError:
+                import imageio.v3 as iio
+                self._count = iio.improps(self.path, plugin='pyav').shape[0]
+            else:
+                video = cv2.VideoCapture(self.path)
+                self._count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+                video.release()
+        return self._count
+
+    def read(self, start, stop):
+        """Iterate over RGB frames from ``start`` to ``stop``."""
+        try:
+            import cv2
+        except ImportError:
+            import imageio.v3 as iio
+            # Open the file once: consecutive reads continue decoding without seeking
+            with iio.imopen(self.path, 'r', plugin='pyav') as video:
+                for index in range(start, stop):
+                    try:
+                        frame = video.read(index=index)
+                    except (StopIteration, IndexError):
+                        return
+                    yield frame
+        else:
+            video = cv2.VideoCapture(self.path)
+            try:
+                video.set(cv2.CAP_PROP_POS_FRAMES, start)
+                for _ in range(start, stop):
+                    ok, frame = video.read()
+                    if not ok:
+                        return
+                    yield frame[..., ::-1]
+            finally:
+                video.release()
+
+
+class ImageSequence:
+    """Frames stored as separate image files.
+
+    Args:
+        paths (list): Image file paths in order.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def read(self, start, stop):
+        """Iterate over RGB frames from ``start`` to ``stop``."""
+        try:
+            import imageio.v3 as iio
+        except ImportError:
+            from PIL import Image
+            for path in self.paths[start:stop]:
+                with Image.open(path) as image:
+                    yield np.asarray(image.convert('RGB'))
+        else:
+            for path in self.paths[start:stop]:
+                yield iio.imread(path)[..., :3]
+
+
+class ZoneExtractor:
+    """Computation of ambilight zone colors from video frames.
+
+    For every side, the colors of a strip along the frame edge are averaged over the strip depth and then over
+    equal parts of the edge, one part per zone. Zones are numbered clockwise, when looking at the screen,
+    starting from the bottom of the left side. Only every ``step``-th pixel is used.
+
+    Args:
+        topology (dict): Ambilight topology.
+        depth (float, optional): Strip depth as a fraction of the frame size. Defaults to 0.1.
+        step (int, optional): Pixel subsampling step. Defaults to 4.
+    """
+
+    def __init__(self, topology, depth=0.1, step=4):
+        self.frame = AmbilightFrame(topology)
+        self.depth = depth
+        self.step = step
+        self._bounds = {}
+
+    def _edges(self, length, count):
+        key = length, count
+        try:
+            return self._bounds[key]
+        except KeyError:
+            edges = np.linspace(0, length, count + 1).astype(int)
+            starts = np.minimum(edges[:-1], length - 1)
+            sizes = np.maximum(edges[1:] - edges[:-1], 1)
+            self._bounds[key] = starts, sizes
+            return starts, sizes
+
+    def _profile(self, strip, axis, count):
+        # Average strip over its depth, then over zone segments along the edge
+        if not count:
+            return None
+        profile = strip.mean(axis=axis, dtype=np.float32)
+        starts, sizes = self._edges(len(profile), count)
+        return np.add.reduceat(profile, starts, axis=0) / sizes[:, None]
+
+    def __call__(self, image):
+        """Compute zone colors of a single frame.
+
+        Args:
+            image (array): RGB frame of shape (height, width, 3).
+
+        Returns:
+            array: Float32 array of shape (layers, sides, zones, 3), like :attr:`AmbilightFrame.data`.
+        """
+        image = image[::self.step, ::self.step, :3]
+        height, width = image.shape[:2]
+        dy, dx = max(int(height * self.depth), 1), max(int(width * self.depth), 1)
+        left, top, right, bottom = self.frame.counts
+        result = np.zeros(self.frame.shape, np.float32)
+        profiles = (
+            self._profile(image[::-1, :dx], 1, left),   # bottom to top
+            self._profile(image[:dy], 0, top),  # left to right
+            self._profile(image[:, -dx:], 1, right),  # top to bottom
+            self._profile(image[-dy:, ::-1], 0, bottom),  # right to left
+        )
+        for s, profile in enumerate(profiles):
+            if profile is not None:
+                result[:, s, :len(profile)] = profile
+        return result
+
+
+def _extract(source, start, stop, topology, depth, step):
+    extract = ZoneExtractor(topology, depth, step)
+    zones = [extract(image) for image in source.read(start, stop)]
+    if not zones:
+        return np.empty((0,) + extract.frame.shape, np.float32)
+    return np.stack(zones)
+
+
+class AmbilightPipeline:
+    """Pipeline computing ambilight frames from video frames.
+
+    Frames are read and zone colors are extracted in chunks by a pool of worker processes, several chunks
+    ahead of the consumer. The results are smoothed over time with exponential moving average.
+
+    Args:
+        source: Frame source, such as :class:`VideoSource` or :class:`ImageSequence`. It must be picklable and
+                provide ``len()`` and ``read(start, stop)`` iterating over RGB frames.
+        topology (dict): Ambilight topology.
+        smoothing (float, optional): Weight of the previous colors in temporal smoothing. Defaults to 0.5.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunk (int, optional): Number of frames processed by a worker at once. Defaults to 16.
+        depth (float, optional): Edge strip depth as a fraction of the frame size. Defaults to 0.1.
+        step (int, optional): Pixel subsampling step. Defaults to 4.
+    """
+
+    def __init__(self, source, topology, smoothing=0.5, workers=None, chunk=16, depth=0.1, step=4):
+        self.source = source
+        self.topology = topology
+        self.smoothing = smoothing
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk = chunk
+        self.depth = depth
+        self.step = step
+
+    def zones(self):
+        """Iterate over raw zone colors of all frames in order.
+
+        The frame count of the source may be only an estimate, so iteration stops at the first chunk with fewer
+        frames than requested.
+
+        Yields:
+            array: Float32 array of shape (layers, sides, zones, 3).
+        """
+        count = len(self.source)
+        bounds = [(start, min(start + self.chunk, count)) for start in range(0, count, self.chunk)]
+        with ProcessPoolExecutor(self.workers) as pool:
+            ahead = 2 * self.workers
+            futures = [pool.submit(_extract, self.source, start, stop, self.topology, self.depth, self.step)
+                       for start, stop in bounds[:ahead]]
+            try:
+                for i in range(len(bounds)):
+                    result = futures[i].result()
+                    futures[i] = None
+                    if i + ahead < len(bounds):
+                        start, stop = bounds[i + ahead]
+                        futures.append(
+                            pool.submit(_extract, self.source, start, stop, self.topology, self.depth, self.step)
+                        )
+                    yield from result
+                    start, stop = bounds[i]
+                    if len(result) < stop - start:
+                        return  # end of the source
+            finally:
+                for future in futures:
+                    if future is not None:
+                        future.cancel()
+
+    def frames(self):
+        """Iterate over smoothed ambilight frames.
+
+        The same :class:`AmbilightFrame` object is yielded every time, with updated colors.
+
+        Yields:
+            AmbilightFrame: Frame.
+        """
+        frame = AmbilightFrame(self.topology)
+        state = None
+        for zones in self.zones():
+            if state is None:
+                state = zones.copy()
+            else:
+                state *= self.smoothing
+                state += (1 - self.smoothing) * zones
+            np.rint(state, out=zones)
+            np.copyto(frame.data, zones, casting='unsafe')
+            yield frame
+
+    def play(self, stream, fps=30.):
+        """Push frames to an ambilight stream at the given rate.
+
+        Frames are pushed on an absolute schedule. If the pipeline falls behind, late frames are skipped.
+
+        Args:
+            stream (AmbilightStream): Started streaming session.
+            fps (float, optional): Frame rate. Defaults to 30.
+
+        Returns:
+            int: Number of skipped frames.
+        """
+        skipped = 0
+        start = monotonic()
+        for i, frame in enumerate(self.frames()):
+            delay = start + i / fps - monotonic()
+            if delay < -1. / fps:
+                skipped += 1
+                continue
+            if delay > 0:
+                sleep(delay)
+            stream.push(frame)
+        return skipped
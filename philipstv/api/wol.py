@@ -1,4 +1,8 @@
 import socket
+import ipaddress
+
+from time import monotonic, sleep
+from typing import Iterable, List, Optional, Tuple, Union
 
 BROADCAST_IP = "255.255.255.255"
 DEFAULT_PORT = 9
@@ -38,3 +42,127 @@ def send_magic_packet(mac: str, ip_address: str = BROADCAST_IP, port: int = DEFA
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         sock.connect((ip_address, port))
         sock.send(packet)
+
+
+def broadcast_address(network: str) -> str:
+    """
+    Get directed broadcast address of the network.
+    Args:
+        network: network in CIDR notation, e.g. '192.168.1.0/24'.
+    """
+    return str(ipaddress.ip_network(network, strict=False).broadcast_address)
+
+
+class WakeOnLan:
+    """
+    Bulk Wake-on-LAN sender.
+    All packets are sent through one UDP socket, which is kept open until
+    the sender is closed. Magic packets are prepared once for all targets.
+    As a single UDP packet can be lost, every packet is sent several times.
+    Packets are paced, so large rooms do not produce broadcast storms.
+    Keyword Args:
+        port: the port to send the magic packets to.
+        repeats: number of times each packet is sent.
+        interval: pause between repeated rounds in seconds.
+        rate: maximum number of packets sent per second or None for no limit.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, repeats: int = 3, interval: float = 0.1,
+                 rate: Optional[float] = 1000.0) -> None:
+        self.port = port
+        self.repeats = repeats
+        self.interval = interval
+        self.rate = rate
+        self._sock = None
+
+    def _socket(self) -> socket.socket:
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        return self._sock
+
+    def close(self) -> None:
+        """Close the socket."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self) -> 'WakeOnLan':
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        self.close()
+
+    def prepare(self, targets: Iterable[Union[str, Tuple[str, str]]]) -> List[Tuple[bytes, Tuple[str, int]]]:
+        """
+        Prepare magic packets and their destinations.
+        Args:
+            targets: mac addresses or pairs (mac, destination). Destination is
+                     an ip address of the host (unicast) or a network in CIDR
+                     notation (directed broadcast). By default packets are
+                     sent to 255.255.255.255.
+        """
+        packets = []
+        for target in targets:
+            if isinstance(target, str):
+                mac, destination = target, BROADCAST_IP
+            else:
+                mac, destination = target
+            if '/' in destination:
+                destination = broadcast_address(destination)
+            packets.append((create_magic_packet(mac), (destination, self.port)))
+        return packets
+
+    def send(self, targets: Iterable[Union[str, Tuple[str, str]]]) -> int:
+        """
+        Wake up all the given targets.
+        Args:
+            targets: mac addresses or pairs (mac, destination) as accepted
+                     by :meth:`prepare`, or the list returned by it.
+        Returns:
+            number of packets sent.
+        """
+        targets = list(targets)
+        if targets and isinstance(targets[0], tuple) and isinstance(targets[0][0], bytes):
+            packets = targets
+        else:
+            packets = self.prepare(targets)
+        sock = self._socket()
+        step = 1. / self.rate if self.rate else 0.
+        sent = 0
+        deadline = monotonic()
+        for i in range(self.repeats):
+            if i and self.interval > 0:
+                sleep(self.interval)
+            for packet, destination in packets:
+                if step:
+                    now = monotonic()
+                    if deadline - now > 0.001:
+                        sleep(deadline - now)
+                    # never burst to catch up
+                    deadline = max(deadline, now) + step
+                try:
+                    sock.sendto(packet, destination)
+                except OSError:
+                    continue
+                sent += 1
+        return sent
+
+
+def send_magic_packets(macs: Iterable[Union[str, Tuple[str, str]]], repeats: int = 3, interval: float = 0.1,
+                       rate: Optional[float] = 1000.0, port: int = DEFAULT_PORT) -> int:
+    """
+    Wake up many computers at once.
+    Wake on lan must be enabled on the host devices.
+    Args:
+        macs: mac addresses or pairs (mac, destination), see :meth:`WakeOnLan.prepare`.
+    Keyword Args:
+        repeats: number of times each packet is sent.
+        interval: pause between repeated rounds in seconds.
+        rate: maximum number of packets sent per second or None for no limit.
+        port: the port to send the magic packets to.
+    Returns:
+        number of packets sent.
+    """
+    with WakeOnLan(port, repeats, interval, rate) as wol:
+        return wol.send(macs)
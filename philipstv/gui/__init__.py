@@ -1,25 +1,34 @@
 import os
 
+from time import monotonic
+
 # import asyncio
 
 import kivy.utils
 from kivy.app import App
 from kivy.core.window import Window
-from kivy.clock import mainthread
+from kivy.clock import Clock, mainthread
 from kivy.factory import Factory
-from kivy.properties import ObjectProperty, StringProperty
+from kivy.properties import BooleanProperty, ObjectProperty, StringProperty
 from kivy.resources import resource_add_path
 from kivy.uix.settings import SettingsWithNoMenu
 from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.screenmanager import NoTransition
 
 from .settings import SettingMac, SettingButton, SettingHelp
+from .executor import CommandExecutor
 from .widgets.toast import toast
 
 from .lang import l, DEFAULT as DEFAULT_LANG
 from .strings import STRINGS
 from ..api import PhilipsAPI, NotAuthorized, ApiError
-from ..api.discover import PhilipsTVDiscover
+from ..api.keys import KeyQueue
+from ..api.channel import SettingsChannel
+from ..api.cache import StringsCache
+from ..api.rtt import RttEstimator
+from ..api.digest import DigestStore
+from ..api.discover import PhilipsTVDiscover, DiscoveryCache
+from ..api.scan import SubnetScanner
 
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 resource_add_path(os.path.join(BASE_PATH, 'data'))
@@ -39,6 +48,7 @@ else:
 
 class DiscoverButton(Factory.Button):
     host = StringProperty()
+    verified = BooleanProperty(True)
 
     def on_release(self):
         app = App.get_running_app()
@@ -49,20 +59,27 @@ class DiscoverButton(Factory.Button):
             app.config.set('philipstv', 'mac', '')
             app.config.write()
             app.setup_auth()
-            try:
-                app.api.get_applications()
-            except NotAuthorized:
-                def after_pair():
-                    app.config.set('philipstv', 'host', app.api.host)
-                    app.config.write()
-                    app.root.current = 'remote'
-                    app.set_mac()
-                app.config.set('philipstv', 'host', '')
-                app.pair(after_pair)
-            else:
+        except Exception as err:
+            toast(l.tr(err), 4.0)
+        else:
+            app.executor.submit(app.api.get_applications, on_result=self._connected, on_error=self._not_connected)
+
+    def _connected(self, *args):
+        app = App.get_running_app()
+        app.root.current = 'remote'
+        app.set_mac()
+
+    def _not_connected(self, err):
+        app = App.get_running_app()
+        if isinstance(err, NotAuthorized):
+            def after_pair():
+                app.config.set('philipstv', 'host', app.api.host)
+                app.config.write()
                 app.root.current = 'remote'
                 app.set_mac()
-        except Exception as err:
+            app.config.set('philipstv', 'host', '')
+            app.pair(after_pair)
+        else:
             toast(l.tr(err), 4.0)
 
 
@@ -70,12 +87,8 @@ class ControlButton(Factory.ToggleButton):
     settings = ObjectProperty()
 
     def on_release(self):
-        api = App.get_running_app().api
-        try:
-            for node, data in self.settings.items():
-                api.update_setting(node, data)
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+        app = App.get_running_app()
+        app.executor.submit(app.api.update_settings, dict(self.settings))
 
 
 class ApplicationButton(Factory.Button):
@@ -86,12 +99,35 @@ class ApplicationButton(Factory.Button):
 class PhilipsTVApp(App):
     use_kivy_settings = False
 
+    executor = ObjectProperty(None, rebind=True)
+
     def __init__(self):
         super().__init__()
         self.api = PhilipsAPI()
+        self.executor = CommandExecutor(on_error=self.show_error)
+        self.keys = KeyQueue(self.api, on_error=mainthread(self.show_error))
+        self.settings_channel = SettingsChannel(self.api, on_error=mainthread(self.show_error))
         self.auth = {}
         self._ambilight_topology = None
         self._discover = None
+        self._scanner = None
+        self._filling_ambilight = False
+        self._last_error = None, 0.
+        self.api.health.add_listener(self._on_reachable)
+
+    def show_error(self, err):
+        # Do not repeat the same message while it is still displayed
+        message = l.tr(err)
+        now = monotonic()
+        if message == self._last_error[0] and now - self._last_error[1] < 4.0:
+            return
+        self._last_error = message, now
+        toast(message, 4.0)
+
+    @mainthread
+    def _on_reachable(self, host):
+        if host == self.api.host:
+            toast(l.tr("TV is reachable again"), 2.0)
 
     def _get_lang(self):
         lang =  self.config.get('interface', 'lang')
@@ -115,6 +151,9 @@ class PhilipsTVApp(App):
     def build(self):
         self.settings_cls = SettingsWithNoMenu
         self.icon = 'icon.png'
+        self.api.strings_cache = StringsCache(os.path.join(self.user_data_dir, 'strings.json'))
+        self.api.rtt = RttEstimator(os.path.join(self.user_data_dir, 'rtt.json'))
+        self.api.digest = DigestStore(os.path.join(self.user_data_dir, 'digest.json'))
         self.api.host = self.config.get('philipstv', 'host')
         self.api.mac = self.config.get('philipstv', 'mac')
 
@@ -136,6 +175,33 @@ class PhilipsTVApp(App):
 
         Window.bind(on_keyboard=self.on_key_press_back, on_key_down=self.on_key_down_vol, on_key_up=self.on_key_up_vol)
         self.clean_hello()
+        self.warm_up()
+        if self.api.host and self.api.user:
+            self.api.preload_strings(country=l.tr('_country'), lang=l.tr('_lang'))
+
+    def on_stop(self):
+        self.api.close()
+        if self._discover is not None:
+            self._discover.close()
+        self.executor.shutdown()
+        self.api.rtt.save()
+        self.api.digest.save()
+
+    def on_pause(self):
+        self.api.keep_alive(None)
+        self.api.rtt.save()
+        self.api.digest.save()
+        return True
+
+    def on_resume(self):
+        if self.root.current == 'remote':
+            self.warm_up()
+
+    def warm_up(self):
+        if self.api.host:
+            # The first handshake runs in the executor, so it neither blocks start-up nor races with commands
+            self.executor.submit(self.api.warm, on_error=lambda err: None)
+            self.api.keep_alive(10.0, immediate=False)
 
     def clean_hello(self):
         if self.api.host:
@@ -146,29 +212,54 @@ class PhilipsTVApp(App):
 
     def start_discovery(self):
         if self._discover is None:
-            self._discover = PhilipsTVDiscover(self._discover_add, self._discover_remove)
+            cache = DiscoveryCache(os.path.join(self.user_data_dir, 'discovered.json'))
+            self._discover = PhilipsTVDiscover(self._discover_add, self._discover_remove,
+                                               cache=cache, on_cached=self._discover_cached)
         self._discover.start()
+        Clock.schedule_once(self._start_scan, 3.0)
+
+    def _start_scan(self, *args):
+        # mDNS may be filtered, so sweep the local network if nothing has been found
+        if self.root.ids.discovered.data or self.root.current != 'discover':
+            return
+        self._scanner = SubnetScanner(on_add=self._discover_add)
+        self._scanner.start()
 
     def stop_discovery(self):
+        Clock.unschedule(self._start_scan)
+        if self._scanner is not None:
+            self._scanner.stop()
+            self._scanner = None
         self._discover.stop()
 
-    @mainthread
-    def _discover_add(self, name, host):
-        item = {'text': name, 'host': host}
+    def _discover_put(self, name, host, verified):
+        item = {'text': name, 'host': host, 'verified': verified}
         container = self.root.ids.discovered
         items = list(container.data)
-        if item not in items:
+        for i, old in enumerate(items):
+            if old['host'] == host:
+                if not verified or old == item:
+                    return
+                items[i] = item
+                break
+        else:
             items.append(item)
-            container.data = items
-            container.refresh_from_data()
+        container.data = items
+        container.refresh_from_data()
+
+    @mainthread
+    def _discover_cached(self, name, host):
+        self._discover_put(name, host, False)
+
+    @mainthread
+    def _discover_add(self, name, host):
+        self._discover_put(name, host, True)
 
     @mainthread
     def _discover_remove(self, name, host):
-        item = {'text': name, 'host': host}
         container = self.root.ids.discovered
-        items = list(container.data)
-        if item in items:
-            items.remove(item)
+        items = [i for i in container.data if i['host'] != host]
+        if len(items) != len(container.data):
             container.data = items
             container.refresh_from_data()
 
@@ -258,15 +349,15 @@ class PhilipsTVApp(App):
             return True
 
     def set_mac(self, *args):
+        # Return future of the detected MAC address (None if not detected) or None if it is already known
         if not self.api.mac:
-            try:
-                self.config.set('philipstv', 'mac', self.api.set_mac())
-            except:
-                pass
-            else:
-                self.config.write()
-                return True
-        return False
+            return self.executor.submit(self.api.set_mac, on_result=self._save_mac, on_error=lambda err: None)
+        return None
+
+    def _save_mac(self, mac):
+        if mac:
+            self.config.set('philipstv', 'mac', mac)
+            self.config.write()
 
     def on_config_change(self, config, section, key, value):
         if section == 'philipstv':
@@ -304,59 +395,64 @@ class PhilipsTVApp(App):
 
     def on_key_up_vol(self, window, key, *args):
         if key == 1073741952:
-            self.root.ids.volumeup.state = 'normal'
-            self.root.ids.volumeup.dispatch('on_release')
+            button = self.root.ids.volumeup
         elif key == 1073741953:
-            self.root.ids.volumedown.state = 'normal'
-            self.root.ids.volumedown.dispatch('on_release')
+            button = self.root.ids.volumedown
         else:
             return False
+        button.state = 'normal'
+        if not button.repeating:
+            button.dispatch('on_release')
         return True
 
     def pair(self, callback=None):
-        try:
-            data = self.api.pair_request()
-        except Exception as err:
-            toast(l.tr(err), 4.0)
-            return
-        if data is not None:
-            self._pair_stage2(data, callback)
+        def on_request(data):
+            if data is not None:
+                self._pair_stage2(data, callback)
+        self.executor.submit(self.api.pair_request, on_result=on_request)
 
     def _pair_stage2(self, data, callback=None):
+        def on_granted(result):
+            self.save_auth()
+            if callback is not None:
+                callback()
+
+        def on_error(err):
+            if isinstance(err, ApiError) and err.response['error_id'] == 'INVALID_PIN':
+                self._pair_stage2(data, callback)
+                toast(l.tr("Invalid PIN"), 4.0)
+            else:
+                toast(l.tr(err), 4.0)
+
         def on_pin_entered(instance):
             del self._popup
-            try:
-                self.api.pair_grant(pin=instance.ids.pin_value.text, **data)
-            except ApiError as err:
-                if err.response['error_id'] == 'INVALID_PIN':
-                    self._pair_stage2(data, callback)
-                    toast(l.tr("Invalid PIN"), 4.0)
-                else:
-                    toast(l.tr(err), 4.0)
-            except Exception as err:
-                toast(l.tr(err), 4.0)
-            else:
-                self.save_auth()
-                if callback is not None:
-                    callback()
+            self.executor.submit(
+                self.api.pair_grant, pin=instance.ids.pin_value.text, **data, on_result=on_granted, on_error=on_error
+            )
 
         self._popup = Factory.PinPopup()
         self._popup.bind(on_dismiss=on_pin_entered)
         self._popup.open()
 
-    def keypress(self, key):
-        try:
-            self.api.send_key(key)
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+    def keypress(self, key, repeat=False):
+        self.keys.put(key, repeat)
+
+    def release_key(self, key):
+        self.keys.release(key)
 
     def fill_display_modes(self, widget):
-        try:
+        country, lang = l.tr('_country'), l.tr('_lang')
+
+        def load():
             items = self.api.get_settings(self.api.PICTURE_STYLE)[self.api.PICTURE_STYLE]['data']
-            selected_item = items['selected_item']
             translations = self.api.get_strings(
-                *(i['string_id'] for i in items['enum_values']), country=l.tr('_country'), lang=l.tr('_lang')
+                *(i['string_id'] for i in items['enum_values']), country=country, lang=lang
             )
+            return items, translations
+
+        def show(result):
+            items, translations = result
+            selected_item = items['selected_item']
             widget.data = [{
                 'text': translations.get(item['string_id'], item['string_id']),
                 'group': 'display_modes',
@@ -368,10 +464,13 @@ class PhilipsTVApp(App):
                 'state': 'down' if item['enum_id'] == selected_item else 'normal',
                 'allow_no_selection': False,
             } for item in items['enum_values'] if item['available']]
-        except Exception as err:
+
+        def on_error(err):
             toast(l.tr(err), 4.0)
             widget.data = []
 
+        self.executor.submit(load, on_result=show, on_error=on_error)
+
     def fill_ambilight(self):
         ids = self.root.ids
         nodes = {
@@ -379,16 +478,16 @@ class PhilipsTVApp(App):
             self.api.AMBILIGHT_MENU_FOLLOW_AUDIO: (ids.ambilight_audio, ids.ambilight_audio_ac),
             self.api.AMBILIGHT_MENU_LOUNGE_LIGHT: (ids.ambilight_lounge, ids.ambilight_lounge_ac)
         }
-        try:
+        country, lang = l.tr('_country'), l.tr('_lang')
+
+        def load():
             settings = self.api.get_settings(
                 self.api.AMBILIGHT_STYLE, self.api.AMBILIGHT_OFF, self.api.AMBILIGHT_LIGHTNESS, self.api.AMBILIGHT_SATURATION,
                 *nodes.keys()
             )
-            current_node = settings[self.api.AMBILIGHT_STYLE]['data']['activenode_id']
+            menus = {}
             for node in nodes:
-                value = settings[node]
-                widget = nodes[node][0]
-                data = value['data']
+                data = settings[node]['data']
                 items = {item['enum_id']: item['string_id'] for item in data['enum_values']}
                 # Add some unofficial audio styles
                 if node == self.api.AMBILIGHT_MENU_FOLLOW_AUDIO:
@@ -397,8 +496,16 @@ class PhilipsTVApp(App):
                         106: 'org.droidtv.ui.strings.R.string.MAIN_FOLLOW_AUDIO_STYLE_5',
                         105: 'org.droidtv.ui.strings.R.string.MAIN_FOLLOW_AUDIO_STYLE_4'
                     })
-                selected_item = data['selected_item']
-                translations = self.api.get_strings(*items.values(), country=l.tr('_country'), lang=l.tr('_lang'))
+                menus[node] = data['selected_item'], items
+            string_ids = (string_id for _, items in menus.values() for string_id in items.values())
+            translations = self.api.get_strings(*string_ids, country=country, lang=lang)
+            return settings, menus, translations
+
+        def show(result):
+            settings, menus, translations = result
+            current_node = settings[self.api.AMBILIGHT_STYLE]['data']['activenode_id']
+            for node, (selected_item, items) in menus.items():
+                widget = nodes[node][0]
                 widget.data = [{
                     'text': translations[string_id],
                     'group': 'ambilight',
@@ -418,44 +525,46 @@ class PhilipsTVApp(App):
             elif current_node in nodes:
                 nodes[current_node][1].collapse = False
 
-            ids.ambilight_lightness.value = settings[self.api.AMBILIGHT_LIGHTNESS]['data']['value']
-            ids.ambilight_saturation.value = settings[self.api.AMBILIGHT_SATURATION]['data']['value']
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+            self._filling_ambilight = True
+            try:
+                ids.ambilight_lightness.value = settings[self.api.AMBILIGHT_LIGHTNESS]['data']['value']
+                ids.ambilight_saturation.value = settings[self.api.AMBILIGHT_SATURATION]['data']['value']
+            finally:
+                self._filling_ambilight = False
+
+        self.executor.submit(load, on_result=show)
 
     def on_ambilight_lightness(self, widget, value):
-        try:
-            self.api.update_setting(self.api.AMBILIGHT_LIGHTNESS, {'value': value})
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+        if not self._filling_ambilight:
+            self.settings_channel.update(self.api.AMBILIGHT_LIGHTNESS, {'value': value})
 
     def on_ambilight_saturation(self, widget, value):
-        try:
-            self.api.update_setting(self.api.AMBILIGHT_SATURATION, {'value': value})
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+        if not self._filling_ambilight:
+            self.settings_channel.update(self.api.AMBILIGHT_SATURATION, {'value': value})
 
     def on_ambilight_color(self):
-        try:
+        r, g, b = self.root.ids.ambilight_color.color[:3]
+        color = dict(r=int(round(255 * r)), g=int(round(255 * g)), b=int(round(255 * b)))
+
+        def set_color():
             if self._ambilight_topology is None:
                 self._ambilight_topology = self.api.get_ambilight_topology()
-            r, g, b = self.root.ids.ambilight_color.color[:3]
-            color = dict(r=int(round(255 * r)), g=int(round(255 * g)), b=int(round(255 * b)))
             values = {
                 side: {str(n): color
                        for n in range(self._ambilight_topology[side])}
                 for side in ('left', 'top', 'right', 'bottom')
             }
             self.api.set_ambilight_expert(self._ambilight_topology['layers'], **values)
+
+        def on_result(result):
             for tb in ToggleButton.get_widgets('ambilight'):
                 tb.state = 'normal'
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+
+        self.executor.submit(set_color, on_result=on_result)
 
     def fill_applications(self, widget):
-        data = []
-        try:
-            apps = self.api.get_applications()
+        def show(apps):
+            data = []
             app_types = list(sorted(set(app['type'] for app in apps)))
             for app_type in app_types:
                 data += [{
@@ -465,15 +574,18 @@ class PhilipsTVApp(App):
                     'class_name': app['intent']['component']['className'],
                     'action': app['intent']['action']
                 } for app in apps if app['type'] == app_type]
-        except Exception as err:
+            widget.data = data
+
+        def on_error(err):
             toast(l.tr(err), 4.0)
-        widget.data = data
+            widget.data = []
+
+        self.executor.submit(self.api.get_applications, on_result=show, on_error=on_error)
 
     def launch_application(self, widget):
-        try:
-            self.api.launch_application(package_name=widget.package_name, class_name=widget.class_name, action=widget.action)
-        except Exception as err:
-            toast(l.tr(err), 4.0)
+        self.executor.submit(
+            self.api.launch_application, package_name=widget.package_name, class_name=widget.class_name, action=widget.action
+        )
 
 
 def run():
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import mainthread
+from kivy.event import EventDispatcher
+from kivy.properties import NumericProperty
+
+
+class CommandExecutor(EventDispatcher):
+    """Background executor for TV commands.
+
+    All calls to the TV API should be submitted here, so the GUI thread never waits for the network.
+    Results and errors are delivered back in the main thread. With the default single worker, commands are
+    run one after another and complete in the order they were submitted, so the GUI never shows a state older
+    than the one set by the previous command.
+
+    Args:
+        max_workers (int, optional): Number of worker threads. Defaults to 1.
+        on_error (function, optional): Default error handler, used when no handler is given to :meth:`submit`.
+    """
+
+    pending = NumericProperty(0)
+    """Number of commands currently in flight."""
+
+    def __init__(self, max_workers=1, on_error=None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_error = on_error
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='philipstv')
+
+    def submit(self, func, *args, on_result=None, on_error=None, **kwargs):
+        """Run function in a background thread.
+
+        Args:
+            func (function): Function to run.
+            args, kwargs: Function arguments.
+            on_result (function, optional): Called in the main thread with the function result.
+            on_error (function, optional): Called in the main thread with the exception raised by the function.
+
+        Returns:
+            concurrent.futures.Future: Future of the submitted call.
+        """
+        self.pending += 1
+        future = self._pool.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda f: self._done(f, on_result, on_error))
+        return future
+
+    @mainthread
+    def _done(self, future, on_result, on_error):
+        self.pending -= 1
+        if future.cancelled():
+            return
+        err = future.exception()
+        if err is None:
+            if on_result is None:
+                return
+            try:
+                on_result(future.result())
+                return
+            except Exception as exc:
+                err = exc
+        if on_error is None:
+            on_error = self.on_error
+        if on_error is not None:
+            on_error(err)
+
+    def shutdown(self):
+        """Stop the executor without waiting for running commands."""
+        self._pool.shutdown(wait=False)
@@ -30,6 +30,7 @@ STRINGS = {
         'Saturation': "Nasycenie",
         'Enter PIN displayed on your TV': "Wprowadź kod PIN wyświetlony na ekranie telewizora",
         'Invalid PIN': "Niepoprawny kod PIN",
+        'TV is reachable again': "Telewizor jest ponownie dostępny",
         '_advanced_settings_help':
             'Otwórz ustawienia telewizora i wybierz [b]Wireless and Networks[/b] > [b]Wired of Wi-Fi[/b] '
             '> [b]View network settings[/b]. Zanotuj wyświetlony adres IP. Następnie wprowadź go poniżej '
@@ -42,9 +42,11 @@ class LongPressButton(Factory.Button):
 
 
 class RepeatButton(Factory.Button):
+    __events__ = 'on_repeat_end',
 
     initial_delay = Factory.NumericProperty(1.0)
     repeat_time = Factory.NumericProperty(0.1)
+    repeating = Factory.BooleanProperty(False)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -52,11 +54,28 @@ class RepeatButton(Factory.Button):
 
     def on_state(self, instance, value):
         if value == 'down':
+            self.repeating = False
             self.__clockev = Clock.schedule_once(self._do_repeat, self.initial_delay)
-        elif self.__clockev is not None:
-            self.__clockev.cancel()
+        else:
+            if self.__clockev is not None:
+                self.__clockev.cancel()
+            self.dispatch('on_repeat_end')
+
+    def on_touch_up(self, touch):
+        if not self.repeating or touch.grab_current is not self:
+            return super().on_touch_up(touch)
+
+        # Button has been repeating: do not send the final release
+        touch.ungrab(self)
+        self.last_touch = touch
+        self._do_release()
+        return True
 
     def _do_repeat(self, dt):
+        self.repeating = True
         self.dispatch('on_release')
         self.__clockev = Clock.schedule_once(self._do_repeat, self.repeat_time)
         self.dispatch('on_press')
+
+    def on_repeat_end(self, *args):
+        pass